@@ -25,21 +25,30 @@ TARGET = {
 }
 
 # ── ETL Settings ──────────────────────────────────────────────
-POLL_INTERVAL_SEC   = 30    # How often the ETL runs (seconds)
+POLL_INTERVAL_SEC   = 30    # Max wait between cycles (seconds) — NOTIFY wakes it sooner
 OVERLAP_SEC         = 90    # Safety overlap — re-process last 90s to catch slow writes
-MAX_BATCH_ROWS      = 5000  # Max rows per table per cycle (prevents memory spikes)
+NOTIFY_CHANNEL      = "etl_changes"  # Source triggers NOTIFY here (setup_source_triggers.py)
+NOTIFY_DEBOUNCE_SEC = 5     # After a NOTIFY, collect more for this long before running a cycle
+MAX_BATCH_ROWS      = 5000  # Rows per extract page — a cycle reads as many pages as it needs
+ETL_WORKERS         = 6     # Table steps run in parallel (one pooled connection each)
+EXTRACT_BATCH_ROWS  = 1000  # Rows handed from extract to load per batch
+PARTITION_MONTHS_AHEAD = 3  # Monthly timeline/history partitions kept ready ahead of now
 
 # Keys to extract from input_data JSONB
 # Run discovery query first: SELECT DISTINCT jsonb_object_keys(input_data) FROM public.fc_scenario_node_data;
-INPUT_DATA_KEYS = [
+# Tuples, not lists: extract.py builds its SELECT and transform.py its column
+# positions from these once at import, so they must not change at runtime.
+# Order must match the inp_* columns in load.NODE_DATA_COLUMNS.
+INPUT_DATA_KEYS = (
     "value", "unit", "start_year", "end_year", "input_type",
     "timeframe", "dosing_type", "actuals_flag", "curve_type",
-    "selected_output", "pfs_flag", "ppc_flag"
-]
+    "selected_output", "pfs_flag", "ppc_flag",
+)
 
 # Keys to extract from event_data JSONB
 # Run: SELECT DISTINCT jsonb_object_keys(event_data) FROM public.fc_scenario_event_data;
-EVENT_DATA_KEYS = [
+# Order must match the evt_* columns in load.EVENT_DATA_COLUMNS.
+EVENT_DATA_KEYS = (
     "year", "share_value", "entry_quarter", "erosion_rate",
-    "launch_date", "steady_state", "sob_value"
-]
+    "launch_date", "steady_state", "sob_value",
+)
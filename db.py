@@ -1,34 +1,89 @@
 # db.py — manages source and target connections
+import csv
+import io
 import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
 import psycopg2.extras
 import psycopg2.pool
 import logging
-from config import SOURCE, TARGET
+import threading
+from config import SOURCE, TARGET, ETL_WORKERS, EXTRACT_BATCH_ROWS
 
 logger = logging.getLogger(__name__)
 
-# Connection pools — reuse connections instead of opening new ones every cycle
+# Connection pools — reuse connections instead of opening new ones every cycle.
+# Threaded pools: pipeline.py runs up to ETL_WORKERS table steps concurrently,
+# one connection per step, so the pool must cover all of them. minconn == maxconn
+# keeps every connection open for the process lifetime — no connect/close
+# churn when a burst needs more than the minimum.
+POOL_SIZE = ETL_WORKERS
 _source_pool = None
 _target_pool = None
+# Guards lazy pool creation — concurrent steps must never build a second pool
+_pool_lock = threading.Lock()
+
+# NUMERIC (1700), TIMESTAMP (1114) and TIMESTAMPTZ (1184) values are only
+# ever copied through to target columns, so source connections keep
+# Postgres' own text for them instead of building Decimal / datetime objects.
+# Assumes the source timestamps are TIMESTAMP (no time zone), like every
+# target column: COPY into a TIMESTAMP column ignores an offset — a decoded
+# datetime's or the raw text's alike — so a TIMESTAMPTZ source column would
+# land as the source session's wall time. Convert one in the extract SQL
+# (col AT TIME ZONE '...') if it is ever added.
+_PASSTHROUGH_TEXT = psycopg2.extensions.new_type(
+    (1700, 1114, 1184), "PASSTHROUGH_TEXT", lambda value, cur: value
+)
+
+class _SourceConnection(psycopg2.extensions.connection):
+    """
+    Source connection that remembers which statements it has PREPAREd.
+    JSONB columns come back as the raw JSON text Postgres sent — no
+    json.loads on fetch — so payloads that are only copied through to a
+    TEXT column (node calc output_data) are never parsed at all. NUMERIC and
+    timestamp columns likewise stay text (see _PASSTHROUGH_TEXT).
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+        psycopg2.extras.register_default_jsonb(self, loads=lambda text: text)
+        psycopg2.extensions.register_type(_PASSTHROUGH_TEXT, self)
 
 def get_source_pool():
     global _source_pool
     if _source_pool is None:
-        _source_pool = psycopg2.pool.SimpleConnectionPool(
-            minconn=1, maxconn=3, **SOURCE
-        )
-        logger.info("Source DB connection pool created")
+        with _pool_lock:
+            if _source_pool is None:
+                _source_pool = psycopg2.pool.ThreadedConnectionPool(
+                    minconn=POOL_SIZE, maxconn=POOL_SIZE,
+                    connection_factory=_SourceConnection, **SOURCE
+                )
+                logger.info("Source DB connection pool created")
     return _source_pool
 
 def get_target_pool():
     global _target_pool
     if _target_pool is None:
-        _target_pool = psycopg2.pool.SimpleConnectionPool(
-            minconn=1, maxconn=3, **TARGET
-        )
-        logger.info("Target DB connection pool created")
+        with _pool_lock:
+            if _target_pool is None:
+                _target_pool = psycopg2.pool.ThreadedConnectionPool(
+                    minconn=POOL_SIZE, maxconn=POOL_SIZE, **TARGET
+                )
+                logger.info("Target DB connection pool created")
     return _target_pool
 
+def source_listener(channel):
+    """
+    Open a dedicated (non-pooled) autocommit source connection that LISTENs
+    on `channel`. Held for the process lifetime by scheduler.py.
+    """
+    conn = psycopg2.connect(**SOURCE)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f"LISTEN {channel}")
+    logger.info(f"Listening on source channel '{channel}'")
+    return conn
+
 def source_conn():
     """Get a connection from the source pool (context manager)."""
     return _PooledConnection(get_source_pool())
@@ -44,33 +99,141 @@ class _PooledConnection:
 
     def __enter__(self):
         self.conn = self.pool.getconn()
+        try:
+            # Health check — a socket killed by a DB restart or idle timeout
+            # is discarded and replaced instead of failing the caller's query
+            with self.conn.cursor() as cur:
+                cur.execute("SELECT 1")
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            logger.warning("Dropping dead pooled connection")
+            self.pool.putconn(self.conn, close=True)
+            self.conn = self.pool.getconn()
         return self.conn
 
     def __exit__(self, exc_type, *args):
-        if exc_type:
+        try:
+            # rollback, not reset(): reset() sends DISCARD ALL, which would
+            # also drop the session's prepared statements (conn.prepared)
             self.conn.rollback()
-        self.pool.putconn(self.conn)
+        finally:
+            self.pool.putconn(self.conn, close=bool(self.conn.closed))
+
+def iter_source(sql, params=None, batch_size=EXTRACT_BATCH_ROWS):
+    """
+    Stream a SELECT from source DB through a server-side (named) cursor,
+    yielding lists of tuples batch_size rows at a time.
+    Only one batch is ever held client-side, so wide rows (large JSON text)
+    never materialize as a whole result set in Python.
+    Note: DECLARE CURSOR can't wrap EXECUTE, so this path is not prepared.
+    """
+    with source_conn() as conn:
+        with conn.cursor(name="etl_stream") as cur:
+            cur.itersize = batch_size
+            cur.execute(sql, params or [])
+            while batch := cur.fetchmany(batch_size):
+                yield batch
 
-def query_source(sql, params=None):
-    """Run a SELECT on source DB, return list of dicts."""
+def iter_source_prepared(name, sql, params, batch_size=EXTRACT_BATCH_ROWS):
+    """
+    Run a SELECT on source DB through a named prepared statement and yield
+    the result as lists of tuples, batch_size rows at a time.
+    The first call on each pooled connection PREPAREs `sql` (which uses
+    $1, $2 ... placeholders); every later call just EXECUTEs it, so
+    Postgres skips parse + analysis and only the parameters go over the wire.
+    Planning is not cached: the keyset extracts' parameters decide whether a
+    page is ten rows or the whole table, and a generic plan would guess (and
+    walk a whole index). On PG 12+ each EXECUTE is sent behind a
+    SET LOCAL plan_cache_mode = force_custom_plan in the same round-trip,
+    scoped to this transaction.
+    """
+    execute = f"EXECUTE {name} ({', '.join(['%s'] * len(params))})"
     with source_conn() as conn:
+        if conn.server_version >= 120000:
+            execute = f"SET LOCAL plan_cache_mode = force_custom_plan; {execute}"
+        with conn.cursor() as cur:
+            if name not in conn.prepared:
+                cur.execute(f"PREPARE {name} AS {sql}")
+                conn.prepared.add(name)
+            try:
+                cur.execute(execute, params)
+            except psycopg2.errors.InvalidSqlStatementName:
+                # The session lost the statement behind our back (e.g. a
+                # DISCARD ALL) — conn.prepared is stale, so prepare it again
+                logger.warning(f"Prepared statement {name} was gone — re-preparing")
+                conn.rollback()
+                cur.execute(f"PREPARE {name} AS {sql}")
+                cur.execute(execute, params)
+            while batch := cur.fetchmany(batch_size):
+                yield batch
+
+def query_target(sql, params=None):
+    """Run a SELECT on target DB, return list of dicts."""
+    with target_conn() as conn:
         with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
             cur.execute(sql, params or [])
             return cur.fetchall()
 
 def execute_target(sql, params=None):
-    """Run a single statement on target DB."""
+    """Run a single statement on target DB, return affected row count."""
     with target_conn() as conn:
         with conn.cursor() as cur:
             cur.execute(sql, params or [])
+            n = cur.rowcount
         conn.commit()
+    return n
 
-def executemany_target(sql, rows):
-    """Bulk insert/upsert on target DB using execute_values."""
+def _copy_csv(rows):
+    """
+    Render rows as a CSV payload for COPY: every non-None value is quoted and
+    None is an unquoted empty field, so only NULL matches COPY's CSV NULL ('')
+    and '' ("") or a literal \\N text value ("\\N") load as text.
+    Python 3.12+: csv.QUOTE_NOTNULL does exactly that, and writerows formats
+    the whole batch in C with no per-cell Python work.
+    Older Pythons: the same quoting is built cell by cell.
+    """
+    buf = io.StringIO()
+    if hasattr(csv, "QUOTE_NOTNULL"):
+        writer = csv.writer(buf, quoting=csv.QUOTE_NOTNULL, lineterminator="\n")
+        writer.writerows(rows)
+    else:
+        for row in rows:
+            buf.write(",".join(
+                "" if v is None else '"' + str(v).replace('"', '""') + '"'
+                for v in row))
+            buf.write("\n")
+    buf.seek(0)
+    return buf
+
+def copy_target(table, columns, rows, merge_sqls):
+    """
+    Bulk load via COPY — the fastest ingest path Postgres has.
+    Rows are streamed as CSV into a temp table staging_<table> (dropped on
+    commit), then each statement in merge_sqls — usually an
+    INSERT ... SELECT FROM {staging}, so ON CONFLICT dedup still applies —
+    moves them into `table`, all in one transaction.
+    `rows` may be any iterable (e.g. a transform generator) — it is read
+    exactly once, while the CSV payload is built.
+    Returns total rows affected by merge_sqls.
+    """
     if not rows:
         return 0
+    staging = f"staging_{table}"
+    col_list = ", ".join(columns)
+
+    buf = _copy_csv(rows)
     with target_conn() as conn:
         with conn.cursor() as cur:
-            psycopg2.extras.execute_values(cur, sql, rows, page_size=500)
+            cur.execute(
+                f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS "
+                f"SELECT {col_list} FROM {table} WITH NO DATA"
+            )
+            cur.copy_expert(
+                f"COPY {staging} ({col_list}) FROM STDIN WITH (FORMAT csv)",
+                buf
+            )
+            n = 0
+            for merge_sql in merge_sqls:
+                cur.execute(merge_sql.format(staging=staging))
+                n += cur.rowcount
         conn.commit()
-    return len(rows)
+    return n
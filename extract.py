@@ -1,55 +1,178 @@
 # extract.py — reads ONLY from source PostgreSQL (read-only)
-# Every function takes a `since` timestamp and returns only NEW/CHANGED rows.
+# Every extract_* takes a `since` timestamp and yields only NEW/CHANGED rows,
+# in batches of EXTRACT_BATCH_ROWS so loading can start before the read ends.
 # This is incremental extraction — we never re-read the whole table.
 
 import logging
-from db import query_source
+from datetime import datetime, timedelta
+
+from config import OVERLAP_SEC, MAX_BATCH_ROWS, INPUT_DATA_KEYS, EVENT_DATA_KEYS
+from db import iter_source, iter_source_prepared, query_target, execute_target
 
 logger = logging.getLogger(__name__)
 
-def get_watermark(table_name):
-    """Read the last processed timestamp for a given table from TARGET DB."""
-    from db import execute_target
-    from datetime import datetime, timedelta
-    rows = query_source.__module__  # just importing
-    # Read from TARGET watermark table
-    import psycopg2, psycopg2.extras
-    from config import TARGET
-    conn = psycopg2.connect(**TARGET)
-    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-        cur.execute(
-            "SELECT last_fetched_at FROM etl_watermark WHERE table_name = %s",
-            [table_name]
-        )
-        row = cur.fetchone()
-    conn.close()
-    if row:
-        # Safety overlap: go back 90 seconds to catch rows written slightly late
-        from config import OVERLAP_SEC
-        from datetime import timedelta
-        return row["last_fetched_at"] - timedelta(seconds=OVERLAP_SEC)
-    return datetime(2020, 1, 1)
 
-def update_watermark(table_name, rows_fetched):
-    """Update the watermark to NOW after a successful ETL cycle."""
-    import psycopg2
-    from config import TARGET
-    from datetime import datetime
-    conn = psycopg2.connect(**TARGET)
-    with conn.cursor() as cur:
-        cur.execute("""
-            UPDATE etl_watermark
-            SET last_fetched_at = NOW(),
-                rows_last_run   = %s,
-                last_run_at     = NOW(),
-                total_rows_ever = total_rows_ever + %s
-            WHERE table_name = %s
-        """, [rows_fetched, rows_fetched, table_name])
-    conn.commit()
-    conn.close()
+# Text that Postgres can safely cast to NUMERIC (exponent capped so a
+# stray '1e999999' can't overflow and fail the whole batch)
+_NUMBER_RE = r"^\s*[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d{1,3})?\s*$"
+
+# Target type for each JSON key; keys not listed stay as text
+_INPUT_KEY_TYPES = {
+    "value": "numeric", "start_year": "int", "end_year": "int",
+    "actuals_flag": "bool", "pfs_flag": "bool", "ppc_flag": "bool",
+}
+_EVENT_KEY_TYPES = {
+    "year": "int", "share_value": "numeric", "erosion_rate": "numeric",
+    "steady_state": "numeric", "sob_value": "numeric",
+}
 
 
-def extract_scenarios(since):
+def _typed_key(column, key, sql_type):
+    """
+    SQL expression for one JSONB key as its target type. Text that doesn't
+    parse becomes NULL instead of raising, so one bad value can't fail a batch.
+    """
+    v = f"({column}->>'{key}')"
+    if sql_type == "numeric":
+        return f"CASE WHEN {v} ~ '{_NUMBER_RE}' THEN {v}::numeric END"
+    if sql_type == "int":
+        return (f"CASE WHEN {v} ~ '{_NUMBER_RE}' THEN CASE WHEN abs({v}::numeric) "
+                f"< 2147483648 THEN trunc({v}::numeric)::int END END")
+    if sql_type == "bool":
+        return f"lower({v}) IN ('true', '1', 'yes')"
+    return v
+
+
+def _jsonb_key_columns(column, keys, key_types, prefix):
+    """
+    SELECT items pulling each whitelisted key out of a JSONB column, already
+    cast to its target column type, plus the full JSON text (NULL for empty /
+    non-object values). Postgres does the lookups and casts, so transform.py
+    copies these columns through untouched.
+    """
+    items = [f"{_typed_key(column, key, key_types.get(key))} AS {prefix}_{key}"
+             for key in keys]
+    items.append(
+        f"CASE WHEN jsonb_typeof({column}) = 'object' AND {column} <> '{{}}'::jsonb "
+        f"THEN {column}::text END AS {column.split('.')[-1]}_full_text"
+    )
+    return ",\n            ".join(items)
+
+
+# Built once at import from config — column order matches INPUT/EVENT_DATA_KEYS
+_INPUT_DATA_COLUMNS = _jsonb_key_columns("nd.input_data", INPUT_DATA_KEYS, _INPUT_KEY_TYPES, "inp")
+_EVENT_DATA_COLUMNS = _jsonb_key_columns("ed.event_data", EVENT_DATA_KEYS, _EVENT_KEY_TYPES, "evt")
+
+def get_all_watermarks(table_names):
+    """
+    Read the watermark of every table in one round-trip.
+    Returns {table_name: (since, after, read_at)}:
+      since   — last processed timestamp minus the overlap (2020 if none)
+      after   — keyset cursor to resume from (FIRST_PAGE unless the last
+                cycle stopped part-way, see save_progress)
+      read_at — what update_watermarks stores once the table is done: the
+                target's clock before the first page, so a row written while
+                the cycle runs is at or after it and gets read again next cycle
+    A resumed table keeps the since and read_at of the cycle it resumes.
+    """
+    rows = query_target("""
+        SELECT t.table_name, w.last_fetched_at, w.resume_after_at, w.resume_after_id,
+               COALESCE(w.resume_read_at, LOCALTIMESTAMP) AS read_at
+        FROM UNNEST(%s::text[]) AS t(table_name)
+        LEFT JOIN etl_watermark w USING (table_name)
+    """, [list(table_names)])
+    # Safety overlap: go back 90 seconds to catch rows written slightly late
+    overlap = timedelta(seconds=OVERLAP_SEC)
+    watermarks = {}
+    for r in rows:
+        since = r["last_fetched_at"] - overlap if r["last_fetched_at"] else datetime(2020, 1, 1)
+        after = FIRST_PAGE
+        if r["resume_after_id"] is not None:
+            after = (r["resume_after_at"], r["resume_after_id"])
+        watermarks[r["table_name"]] = (since, after, r["read_at"])
+    return watermarks
+
+def save_progress(table_name, after, read_at):
+    """
+    Record a step's keyset cursor after a loaded batch, with the read_at of
+    its cycle, so a cycle that fails part-way through a catch-up resumes
+    from there instead of from the first page. update_watermarks clears it.
+    """
+    execute_target("""
+        INSERT INTO etl_watermark (table_name, resume_after_at, resume_after_id, resume_read_at)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (table_name) DO UPDATE SET
+            resume_after_at = EXCLUDED.resume_after_at,
+            resume_after_id = EXCLUDED.resume_after_id,
+            resume_read_at  = EXCLUDED.resume_read_at
+    """, [table_name, str(after[0]), after[1], read_at])
+
+def update_watermarks(finished):
+    """
+    Move the watermark to read_at for every table in
+    {table_name: (rows_fetched, read_at)} after a successful ETL cycle, and
+    clear any resume cursor — one upsert for all of them, which also
+    creates any row setup_target never seeded.
+    """
+    if not finished:
+        return
+    names = list(finished)
+    execute_target("""
+        INSERT INTO etl_watermark
+            (table_name, last_fetched_at, rows_last_run, last_run_at, total_rows_ever)
+        SELECT t.table_name, t.read_at, t.n, NOW(), t.n
+        FROM UNNEST(%s::text[], %s::int[], %s::timestamp[]) AS t(table_name, n, read_at)
+        ON CONFLICT (table_name) DO UPDATE SET
+            last_fetched_at = EXCLUDED.last_fetched_at,
+            rows_last_run   = EXCLUDED.rows_last_run,
+            last_run_at     = NOW(),
+            total_rows_ever = etl_watermark.total_rows_ever + EXCLUDED.rows_last_run,
+            resume_after_at = NULL,
+            resume_after_id = NULL,
+            resume_read_at  = NULL
+    """, [names, [finished[t][0] for t in names], [finished[t][1] for t in names]])
+
+
+def _counted(pages, label):
+    """Pass (batch, cursor) pairs through, then log how many rows they held."""
+    total = 0
+    for batch, after in pages:
+        total += len(batch)
+        yield batch, after
+    if total:
+        logger.info(f"  {label}: {total}")
+
+
+# Keyset cursor that sorts before every real row, so the first page's
+# (timestamp, id) > cursor test passes for any non-NULL timestamp
+FIRST_PAGE = ("-infinity", "00000000-0000-0000-0000-000000000000")
+
+def _keyset_pages(fetch_page, time_col, after):
+    """
+    Read a changed-row set in MAX_BATCH_ROWS pages keyed on (timestamp, id):
+    the watermark timestamp at position time_col and the source id in column
+    0, starting past `after`. fetch_page(after_time, after_id) returns the
+    batches of the next page, and paging stops at the first short page.
+    Yields (batch, cursor after that batch) — the pipeline saves the cursor
+    once the batch is loaded (save_progress), so a failed catch-up resumes
+    there rather than re-reading every page before it.
+    Paging follows the watermark column, so new rows sort after the cursor
+    instead of at random among the pages already read; anything the cursor
+    has passed is behind read_at and is picked up next cycle. Rows whose
+    timestamp is NULL never compare greater than the cursor and are skipped.
+    """
+    while True:
+        n = 0
+        for batch in fetch_page(*after):
+            n += len(batch)
+            last = batch[-1]
+            after = (last[time_col], last[0])
+            yield batch, after
+        if n < MAX_BATCH_ROWS:
+            return
+
+
+def extract_scenarios(since, after=FIRST_PAGE):
     """
     Fetch scenarios that were created OR updated since the watermark.
     Pre-joins public.fc_model and public.fc_forecast_init so target needs no joins.
@@ -95,34 +218,49 @@ def extract_scenarios(since):
             fi.horizon_start_limit,
             fi.horizon_end_limit,
             fi.starter_created
-        FROM public.fc_scenario s
+        FROM (
+            -- One branch per timestamp instead of a 5-way OR, so each branch
+            -- can use that column's index; UNION dedups scenarios hit twice.
+            -- Each branch applies the keyset cursor itself, so the UNION
+            -- only dedups the ids still ahead of it
+            SELECT id FROM public.fc_scenario WHERE created_at   >= $1
+               AND (created_at, id) > ($2, $3)
+            UNION
+            SELECT id FROM public.fc_scenario WHERE updated_at   >= $1
+               AND (created_at, id) > ($2, $3)
+            UNION
+            SELECT id FROM public.fc_scenario WHERE submitted_at >= $1
+               AND (created_at, id) > ($2, $3)
+            UNION
+            SELECT id FROM public.fc_scenario WHERE locked_at    >= $1
+               AND (created_at, id) > ($2, $3)
+            UNION
+            SELECT id FROM public.fc_scenario WHERE withdraw_at  >= $1
+               AND (created_at, id) > ($2, $3)
+        ) changed
+        JOIN public.fc_scenario s        ON s.id = changed.id
         JOIN public.fc_model m           ON s.model_id = m.id
         JOIN public.fc_forecast_init fi  ON s.forecast_init_id = fi.id
-        WHERE s.created_at >= %(since)s
-           OR s.updated_at >= %(since)s
-           OR s.submitted_at >= %(since)s
-           OR s.locked_at >= %(since)s
-           OR s.withdraw_at >= %(since)s
-        LIMIT 5000
+        ORDER BY s.created_at, s.id
+        LIMIT $4
     """
-    rows = query_source(sql, {"since": since})
-    logger.info(f"  Scenarios extracted: {len(rows)}")
-    return rows
+    pages = _keyset_pages(lambda after_at, after_id: iter_source_prepared(
+        "extract_scenarios", sql, [since, after_at, after_id, MAX_BATCH_ROWS]), 10, after)
+    yield from _counted(pages, "Scenarios extracted")
 
 
-def extract_node_data(since):
+def extract_node_data(since, after=FIRST_PAGE):
     """
     Fetch node input rows created OR ended since watermark.
     'ended' means end_at was set (previous version closed out).
     Pre-joins node hierarchy (tab, group, node) so Power BI needs no joins.
     """
     logger.debug(f"Extracting node data since {since}")
-    sql = """
+    sql = f"""
         SELECT
             nd.id,
             nd.scenario_id,
             nd.model_node_id,
-            nd.input_data,          -- JSONB — will be flattened in transform
             nd.input_hash,
             nd.input_validated,
             nd.input_validation_message,
@@ -140,22 +278,25 @@ def extract_node_data(since):
             mg.group_seq,
             mt.tab_display_name     AS tab_name,
             mt.tab_level,
-            mt.tab_seq
+            mt.tab_seq,
+            -- input_data JSONB keys, already cast to their target types
+            {_INPUT_DATA_COLUMNS}
         FROM public.fc_scenario_node_data nd
         JOIN public.fc_model_node mn        ON nd.model_node_id = mn.id
         JOIN public.fc_model_node_groups mg ON mn.model_node_group_id = mg.id
         JOIN public.fc_model_node_tab mt    ON mg.model_node_tab_id = mt.id
-        WHERE nd.created_at >= %(since)s
-           OR (nd.end_at IS NOT NULL AND nd.end_at >= %(since)s)
-        ORDER BY nd.created_at
-        LIMIT 5000
+        WHERE (nd.created_at >= $1
+               OR (nd.end_at IS NOT NULL AND nd.end_at >= $1))
+          AND (nd.created_at, nd.id) > ($2, $3)
+        ORDER BY nd.created_at, nd.id
+        LIMIT $4
     """
-    rows = query_source(sql, {"since": since})
-    logger.info(f"  Node data rows extracted: {len(rows)}")
-    return rows
+    pages = _keyset_pages(lambda after_at, after_id: iter_source_prepared(
+        "extract_node_data", sql, [since, after_at, after_id, MAX_BATCH_ROWS]), 7, after)
+    yield from _counted(pages, "Node data rows extracted")
 
 
-def extract_runs(since):
+def extract_runs(since, after=FIRST_PAGE):
     """
     Fetch runs started OR completed since watermark.
     Pre-aggregates branch + node calc counts so Power BI sees flat numbers.
@@ -174,29 +315,46 @@ def extract_runs(since):
                 2
             )                                                           AS run_duration_minutes,
             sr.fail_reason,
-            COUNT(DISTINCT rb.id)                                       AS branch_count,
-            COUNT(nc.id)                                                AS total_nodes_processed,
-            SUM(CASE WHEN nc.status = 'success' THEN 1 ELSE 0 END)     AS nodes_success,
-            SUM(CASE WHEN nc.status = 'failed'  THEN 1 ELSE 0 END)     AS nodes_failed,
-            SUM(CASE WHEN nc.status = 'timeout' THEN 1 ELSE 0 END)     AS nodes_timeout
+            b.branch_count,
+            n.total_nodes_processed,
+            n.nodes_success,
+            n.nodes_failed,
+            n.nodes_timeout
         FROM public.fc_scenario_run sr
-        LEFT JOIN public.fc_scenario_run_branch rb ON rb.scenario_run_id = sr.id
-        LEFT JOIN public.fc_scenario_node_calc  nc ON nc.scenario_run_branch_id = rb.id
-        WHERE sr.run_at >= %(since)s
-           OR (sr.run_complete_at IS NOT NULL AND sr.run_complete_at >= %(since)s)
-        GROUP BY sr.id, sr.scenario_id, sr.run_status, sr.run_at,
-                 sr.run_by, sr.run_complete_at, sr.fail_reason
-        LIMIT 1000
+        -- Each aggregate counts its own table for just this run — no
+        -- branch × calc cross product to hash-dedup with COUNT(DISTINCT)
+        LEFT JOIN LATERAL (
+            SELECT COUNT(*) AS branch_count
+            FROM public.fc_scenario_run_branch rb
+            WHERE rb.scenario_run_id = sr.id
+        ) b ON TRUE
+        LEFT JOIN LATERAL (
+            SELECT
+                COUNT(*)                                       AS total_nodes_processed,
+                COUNT(*) FILTER (WHERE nc.status = 'success')  AS nodes_success,
+                COUNT(*) FILTER (WHERE nc.status = 'failed')   AS nodes_failed,
+                COUNT(*) FILTER (WHERE nc.status = 'timeout')  AS nodes_timeout
+            FROM public.fc_scenario_run_branch rb
+            JOIN public.fc_scenario_node_calc  nc ON nc.scenario_run_branch_id = rb.id
+            WHERE rb.scenario_run_id = sr.id
+        ) n ON TRUE
+        WHERE (sr.run_at >= $1
+               OR (sr.run_complete_at IS NOT NULL AND sr.run_complete_at >= $1))
+          AND (sr.run_at, sr.id) > ($2, $3)
+        ORDER BY sr.run_at, sr.id
+        LIMIT $4
     """
-    rows = query_source(sql, {"since": since})
-    logger.info(f"  Runs extracted: {len(rows)}")
-    return rows
+    pages = _keyset_pages(lambda after_at, after_id: iter_source_prepared(
+        "extract_runs", sql, [since, after_at, after_id, MAX_BATCH_ROWS]), 3, after)
+    yield from _counted(pages, "Runs extracted")
 
 
-def extract_node_calc(since):
+def extract_node_calc(since, after=FIRST_PAGE):
     """
     Fetch node calculation results (outputs) since watermark.
     Pre-joins node name and run branch event tag.
+    Streamed through a server-side cursor — output_data_text can be
+    multi-MB per cycle, so it is never buffered as one result set.
     """
     logger.debug(f"Extracting node calc results since {since}")
     sql = """
@@ -217,26 +375,30 @@ def extract_node_calc(since):
                 EXTRACT(EPOCH FROM (nc.processing_end_at - nc.processing_start_at)),
                 3
             )                                                           AS processing_duration_s,
-            nc.output_data::text                                        AS output_data_text
+            nc.output_data                                              AS output_data_text,
+            nc.created_at                                               -- paging key only
         FROM public.fc_scenario_node_calc nc
         JOIN public.fc_scenario_run_branch rb ON nc.scenario_run_branch_id = rb.id
         JOIN public.fc_scenario_run sr        ON rb.scenario_run_id = sr.id
         JOIN public.fc_model_node mn          ON nc.model_node_id = mn.id
         WHERE nc.created_at >= %(since)s
-        LIMIT 5000
+          AND (nc.created_at, nc.id) > (%(after_at)s, %(after_id)s)
+        ORDER BY nc.created_at, nc.id
+        LIMIT %(page)s
     """
-    rows = query_source(sql, {"since": since})
-    logger.info(f"  Node calc results extracted: {len(rows)}")
-    return rows
+    pages = _keyset_pages(lambda after_at, after_id: iter_source(
+        sql, {"since": since, "after_at": after_at, "after_id": after_id,
+              "page": MAX_BATCH_ROWS}), -1, after)
+    yield from _counted(pages, "Node calc results extracted")
 
 
-def extract_event_data(since):
+def extract_event_data(since, after=FIRST_PAGE):
     """
     Fetch event data rows created OR ended since watermark.
     Pre-joins event type name and segment node names.
     """
     logger.debug(f"Extracting event data since {since}")
-    sql = """
+    sql = f"""
         SELECT
             ed.id,
             st.scenario_id,
@@ -247,173 +409,25 @@ def extract_event_data(since):
             ed.created_at                   AS version_started_at,
             ed.end_at                       AS version_ended_at,
             ed.created_by                   AS edited_by,
-            ed.event_data,                  -- JSONB — flattened in transform
             ed.event_data_hash,
             ed.is_overridden,
             ed.event_shares_overridden::text AS override_data_text,
             ed.is_validated,
-            ed.input_validation_message     AS validation_message
+            ed.input_validation_message     AS validation_message,
+            -- event_data JSONB keys, already cast to their target types
+            {_EVENT_DATA_COLUMNS}
         FROM public.fc_scenario_event_data ed
         JOIN public.fc_scenario_event_type st ON ed.scenario_event_type_id = st.id
         JOIN public.fc_event_type et           ON st.event_type_id = et.id
         LEFT JOIN public.fc_model_node pn      ON ed.population_node_id = pn.id
         LEFT JOIN public.fc_model_node ppn     ON ed.parent_product_node_id = ppn.id
-        WHERE ed.created_at >= %(since)s
-           OR (ed.end_at IS NOT NULL AND ed.end_at >= %(since)s)
-        LIMIT 5000
-    """
-    rows = query_source(sql, {"since": since})
-    logger.info(f"  Event data rows extracted: {len(rows)}")
-    return rows
-
-
-def extract_timeline_events(since):
-    """
-    The UNION ALL timeline query — runs in source DB.
-    Returns every type of user action since watermark as flat rows.
-    Power BI never needs to do this join — it just reads the pre-built table.
+        WHERE (ed.created_at >= $1
+               OR (ed.end_at IS NOT NULL AND ed.end_at >= $1))
+          AND (ed.created_at, ed.id) > ($2, $3)
+        ORDER BY ed.created_at, ed.id
+        LIMIT $4
     """
-    logger.debug(f"Extracting timeline events since {since}")
-    sql = """
-        SELECT
-            event_time,
-            event_type,
-            event_category,
-            actor,
-            description,
-            run_id,
-            node_name,
-            event_type_name,
-            scenario_id,
-            source_key
-        FROM (
-
-            -- 1. Scenario created
-            SELECT
-                created_at              AS event_time,
-                'SCENARIO_CREATED'      AS event_type,
-                'LIFECYCLE'             AS event_category,
-                created_by              AS actor,
-                'Scenario created'      AS description,
-                NULL::uuid              AS run_id,
-                NULL                    AS node_name,
-                NULL                    AS event_type_name,
-                id                      AS scenario_id,
-                'SC_' || id::text       AS source_key
-            FROM public.fc_scenario
-            WHERE created_at >= %(since)s
-
-            UNION ALL
-
-            -- 2. Scenario submitted
-            SELECT
-                submitted_at, 'SUBMITTED', 'LIFECYCLE', submitted_by,
-                'Scenario submitted', NULL, NULL, NULL, id,
-                'SUBM_' || id::text
-            FROM public.fc_scenario
-            WHERE submitted_at >= %(since)s AND submitted_at IS NOT NULL
-
-            UNION ALL
-
-            -- 3. Scenario locked
-            SELECT
-                locked_at, 'LOCKED', 'LIFECYCLE', locked_by,
-                'Scenario locked', NULL, NULL, NULL, id,
-                'LOCK_' || id::text
-            FROM public.fc_scenario
-            WHERE locked_at >= %(since)s AND locked_at IS NOT NULL
-
-            UNION ALL
-
-            -- 4. Scenario withdrawn
-            SELECT
-                withdraw_at, 'WITHDRAWN', 'LIFECYCLE', withdraw_by,
-                'Scenario withdrawn', NULL, NULL, NULL, id,
-                'WITH_' || id::text
-            FROM public.fc_scenario
-            WHERE withdraw_at >= %(since)s AND withdraw_at IS NOT NULL
+    pages = _keyset_pages(lambda after_at, after_id: iter_source_prepared(
+        "extract_event_data", sql, [since, after_at, after_id, MAX_BATCH_ROWS]), 6, after)
+    yield from _counted(pages, "Event data rows extracted")
 
-            UNION ALL
-
-            -- 5. Node input edits (every row in append-only table = one edit event)
-            SELECT
-                nd.created_at,
-                'NODE_EDITED',
-                'INPUT_CHANGE',
-                nd.created_by,
-                'Node edited: ' || mn.node_display_name
-                    || ' | Validated: ' || nd.input_validated::text,
-                NULL,
-                mn.node_display_name,
-                NULL,
-                nd.scenario_id,
-                'NE_' || nd.id::text
-            FROM public.fc_scenario_node_data nd
-            JOIN public.fc_model_node mn ON nd.model_node_id = mn.id
-            WHERE nd.created_at >= %(since)s
-
-            UNION ALL
-
-            -- 6. Event data edits
-            SELECT
-                ed.created_at,
-                'EVENT_EDITED',
-                'EVENT_CHANGE',
-                ed.created_by,
-                'Event edited: ' || et.display_name
-                    || COALESCE(' | Segment: ' || pn.node_display_name, ''),
-                NULL,
-                NULL,
-                et.display_name,
-                st.scenario_id,
-                'EVT_' || ed.id::text
-            FROM public.fc_scenario_event_data ed
-            JOIN public.fc_scenario_event_type st ON ed.scenario_event_type_id = st.id
-            JOIN public.fc_event_type et           ON st.event_type_id = et.id
-            LEFT JOIN public.fc_model_node pn      ON ed.population_node_id = pn.id
-            WHERE ed.created_at >= %(since)s
-
-            UNION ALL
-
-            -- 7. Forecast run triggered
-            SELECT
-                run_at,
-                'RUN_TRIGGERED',
-                'RUN',
-                run_by,
-                'Run started',
-                id,
-                NULL,
-                NULL,
-                scenario_id,
-                'RT_' || id::text
-            FROM public.fc_scenario_run
-            WHERE run_at >= %(since)s
-
-            UNION ALL
-
-            -- 8. Forecast run completed (success or failure)
-            SELECT
-                run_complete_at,
-                'RUN_COMPLETED',
-                'RUN',
-                run_by,
-                'Run completed: ' || run_status
-                    || COALESCE(' | Error: ' || fail_reason, ''),
-                id,
-                NULL,
-                NULL,
-                scenario_id,
-                'RC_' || id::text
-            FROM public.fc_scenario_run
-            WHERE run_complete_at >= %(since)s
-              AND run_complete_at IS NOT NULL
-
-        ) timeline
-        WHERE event_time IS NOT NULL
-        ORDER BY event_time
-        LIMIT 10000
-    """
-    rows = query_source(sql, {"since": since})
-    logger.info(f"  Timeline events extracted: {len(rows)}")
-    return rows
@@ -2,33 +2,39 @@
 # Each function explains exactly WHY it uses INSERT vs UPSERT vs UPDATE
 
 import logging
-from db import executemany_target, execute_target
+from db import copy_target
 
 logger = logging.getLogger(__name__)
 
 
+SCENARIO_COLUMNS = [
+    "scenario_id", "scenario_display_name", "scenario_status", "is_starter",
+    "currency", "currency_code", "scenario_start_year", "scenario_end_year",
+    "scenario_region_name", "scenario_country_name",
+    "created_at", "created_by", "submitted_at", "submitted_by",
+    "locked_at", "locked_by", "updated_at", "updated_by",
+    "withdraw_at", "withdraw_by", "delete_at",
+    "model_id", "model_display_name", "model_type", "model_publish_level",
+    "therapeutic_area_name", "disease_area_name", "loe_enabled",
+    "model_region_name", "model_country_name",
+    "forecast_cycle_name", "forecast_cycle_start", "forecast_cycle_end",
+    "horizon_start_limit", "horizon_end_limit", "starter_created",
+]
+
+
 def load_scenarios(rows):
     """
     UPSERT — scenario already exists? Update its mutable fields.
     Why: A scenario is created once, but status, submitted_at, locked_at etc
          change over time. We want ONE row per scenario, always up to date.
+    Rows are COPYed into staging and upserted from there in one statement.
     """
     if not rows:
         return 0
-    sql = """
-        INSERT INTO dim_scenario (
-            scenario_id, scenario_display_name, scenario_status, is_starter,
-            currency, currency_code, scenario_start_year, scenario_end_year,
-            scenario_region_name, scenario_country_name,
-            created_at, created_by, submitted_at, submitted_by,
-            locked_at, locked_by, updated_at, updated_by,
-            withdraw_at, withdraw_by, delete_at,
-            model_id, model_display_name, model_type, model_publish_level,
-            therapeutic_area_name, disease_area_name, loe_enabled,
-            model_region_name, model_country_name,
-            forecast_cycle_name, forecast_cycle_start, forecast_cycle_end,
-            horizon_start_limit, horizon_end_limit, starter_created
-        ) VALUES %s
+    cols = ", ".join(SCENARIO_COLUMNS)
+    merge_sql = f"""
+        INSERT INTO dim_scenario ({cols})
+        SELECT {cols} FROM {{staging}}
         ON CONFLICT (scenario_id) DO UPDATE SET
             scenario_status   = EXCLUDED.scenario_status,
             submitted_at      = EXCLUDED.submitted_at,
@@ -42,61 +48,92 @@ def load_scenarios(rows):
             delete_at         = EXCLUDED.delete_at,
             etl_updated_at    = NOW()
     """
-    n = executemany_target(sql, rows)
-    logger.info(f"  dim_scenario: {n} rows upserted")
+    n = copy_target("dim_scenario", SCENARIO_COLUMNS, rows, [merge_sql])
+    if n:
+        logger.info(f"  dim_scenario: {n} rows upserted")
     return n
 
 
+NODE_DATA_COLUMNS = [
+    "source_id", "scenario_id", "model_node_id",
+    "node_display_name", "node_type", "tab_name", "tab_level",
+    "group_name", "group_type", "node_seq", "flow",
+    "version_started_at", "version_ended_at", "is_current_version",
+    "edited_by", "input_hash", "input_validated", "validation_message",
+    "data_source",
+    "inp_value", "inp_unit", "inp_start_year", "inp_end_year",
+    "inp_input_type", "inp_timeframe", "inp_dosing_type", "inp_actuals_flag",
+    "inp_curve_type", "inp_selected_output", "inp_pfs_flag", "inp_ppc_flag",
+    "input_data_full_text",
+]
+
+
 def load_node_data(rows):
     """
-    INSERT with ON CONFLICT DO UPDATE for is_current_version.
-    Why: Append-only source — new version = INSERT. Old version ending = 
+    INSERT new versions, UPDATE ended versions.
+    Why: Append-only source — new version = INSERT. Old version ending =
          UPDATE its is_current_version to FALSE and set version_ended_at.
-    source_id (= public.fc_scenario_node_data.id) is the dedup key.
+    Why COPY + UPDATE instead of one upsert: nearly every row is a brand-new
+    version, so rows are COPYed into staging, one UPDATE touches only the
+    existing rows whose mutable fields changed (the handful of ended
+    versions), and the rest go in with INSERT ... ON CONFLICT DO NOTHING.
+    source_id (= public.fc_scenario_node_data.id) is the dedup key, paired
+    with the partition key version_started_at (fixed for a given version).
     """
     if not rows:
         return 0
-    sql = """
-        INSERT INTO fact_node_input_history (
-            source_id, scenario_id, model_node_id,
-            node_display_name, node_type, tab_name, tab_level,
-            group_name, group_type, node_seq, flow,
-            version_started_at, version_ended_at, is_current_version,
-            edited_by, input_hash, input_validated, validation_message,
-            data_source,
-            inp_value, inp_unit, inp_start_year, inp_end_year,
-            inp_input_type, inp_timeframe, inp_dosing_type, inp_actuals_flag,
-            inp_curve_type, inp_selected_output, inp_pfs_flag, inp_ppc_flag,
-            input_data_full_text
-        ) VALUES %s
-        ON CONFLICT (source_id) DO UPDATE SET
+    cols = ", ".join(NODE_DATA_COLUMNS)
+    update_sql = """
+        UPDATE fact_node_input_history t SET
             -- Only mutable field: when end_at gets set on the source row,
             -- we need to flip is_current_version to FALSE here
-            version_ended_at    = EXCLUDED.version_ended_at,
-            is_current_version  = EXCLUDED.is_current_version,
-            input_validated     = EXCLUDED.input_validated,
-            validation_message  = EXCLUDED.validation_message,
+            version_ended_at    = s.version_ended_at,
+            is_current_version  = s.is_current_version,
+            input_validated     = s.input_validated,
+            validation_message  = s.validation_message,
             etl_loaded_at       = NOW()
+        FROM {staging} s
+        WHERE t.source_id = s.source_id
+          -- partition key — lets the UPDATE prune to the versions' months
+          AND t.version_started_at = s.version_started_at
+          AND (t.version_ended_at, t.is_current_version,
+               t.input_validated,  t.validation_message)
+              IS DISTINCT FROM
+              (s.version_ended_at, s.is_current_version,
+               s.input_validated,  s.validation_message)
     """
-    n = executemany_target(sql, rows)
-    logger.info(f"  fact_node_input_history: {n} rows upserted")
+    insert_sql = f"""
+        INSERT INTO fact_node_input_history ({cols})
+        SELECT {cols} FROM {{staging}}
+        ON CONFLICT (source_id, version_started_at) DO NOTHING
+    """
+    n = copy_target("fact_node_input_history", NODE_DATA_COLUMNS, rows,
+                    [update_sql, insert_sql])
+    if n:
+        logger.info(f"  fact_node_input_history: {n} rows upserted")
     return n
 
 
+RUN_COLUMNS = [
+    "run_id", "scenario_id", "run_status", "run_at", "run_by",
+    "run_complete_at", "run_duration_minutes", "fail_reason",
+    "branch_count", "total_nodes_processed",
+    "nodes_success", "nodes_failed", "nodes_timeout",
+]
+
+
 def load_runs(rows):
     """
     UPSERT — a run starts as IN_PROGRESS and later becomes SUCCESS/FAILED.
     Same run_id, status changes → UPDATE the existing row.
+    COPY to staging, then one INSERT ... ON CONFLICT DO UPDATE from it.
     """
     if not rows:
         return 0
-    sql = """
-        INSERT INTO fact_run_summary (
-            run_id, scenario_id, run_status, run_at, run_by,
-            run_complete_at, run_duration_minutes, fail_reason,
-            branch_count, total_nodes_processed,
-            nodes_success, nodes_failed, nodes_timeout
-        ) VALUES %s
+    cols = ", ".join(RUN_COLUMNS)
+    merge_sql = f"""
+        INSERT INTO fact_run_summary ({cols})
+        SELECT {cols} FROM {{staging}}
         ON CONFLICT (run_id) DO UPDATE SET
             run_status              = EXCLUDED.run_status,
             run_complete_at         = EXCLUDED.run_complete_at,
@@ -109,79 +146,119 @@ def load_runs(rows):
             nodes_timeout           = EXCLUDED.nodes_timeout,
             etl_updated_at          = NOW()
     """
-    n = executemany_target(sql, rows)
-    logger.info(f"  fact_run_summary: {n} rows upserted")
+    n = copy_target("fact_run_summary", RUN_COLUMNS, rows, [merge_sql])
+    if n:
+        logger.info(f"  fact_run_summary: {n} rows upserted")
     return n
 
 
+NODE_CALC_COLUMNS = [
+    "source_id", "run_id", "scenario_id", "branch_id", "event_tag",
+    "model_node_id", "node_display_name", "node_type",
+    "calc_status", "fail_reason",
+    "processing_start_at", "processing_end_at", "processing_duration_s",
+    "output_data_text",
+]
+
+
 def load_node_calc(rows):
     """
     INSERT ONLY (with dedup) — calc results never change once written.
-    ON CONFLICT DO NOTHING = if already inserted, skip silently.
+    Why COPY: this is the largest-volume loader and purely additive, so rows
+    are COPYed into a staging table and merged with ON CONFLICT DO NOTHING
+    (= if already inserted, skip silently).
     """
     if not rows:
         return 0
-    sql = """
-        INSERT INTO fact_node_calc_results (
-            source_id, run_id, scenario_id, branch_id, event_tag,
-            model_node_id, node_display_name, node_type,
-            calc_status, fail_reason,
-            processing_start_at, processing_end_at, processing_duration_s,
-            output_data_text
-        ) VALUES %s
+    cols = ", ".join(NODE_CALC_COLUMNS)
+    merge_sql = f"""
+        INSERT INTO fact_node_calc_results ({cols})
+        SELECT {cols} FROM {{staging}}
         ON CONFLICT (source_id) DO NOTHING
     """
-    n = executemany_target(sql, rows)
-    logger.info(f"  fact_node_calc_results: {n} rows inserted")
+    n = copy_target("fact_node_calc_results", NODE_CALC_COLUMNS, rows, [merge_sql])
+    if n:
+        logger.info(f"  fact_node_calc_results: {n} rows inserted")
     return n
 
 
+EVENT_DATA_COLUMNS = [
+    "source_id", "scenario_id", "event_type_name", "is_inherent",
+    "population_node_name", "parent_product_name",
+    "version_started_at", "version_ended_at", "is_current_version",
+    "edited_by", "event_data_hash", "is_overridden", "override_data_text",
+    "is_validated", "validation_message",
+    "evt_year", "evt_share_value", "evt_entry_quarter", "evt_erosion_rate",
+    "evt_launch_date", "evt_steady_state", "evt_sob_value",
+    "event_data_full_text",
+]
+
+
 def load_event_data(rows):
     """
     Same pattern as node data — append-only source.
-    INSERT new versions, UPDATE ended versions.
+    COPY to staging, UPDATE ended versions, INSERT new versions.
     """
     if not rows:
         return 0
-    sql = """
-        INSERT INTO fact_event_input_history (
-            source_id, scenario_id, event_type_name, is_inherent,
-            population_node_name, parent_product_name,
-            version_started_at, version_ended_at, is_current_version,
-            edited_by, event_data_hash, is_overridden, override_data_text,
-            is_validated, validation_message,
-            evt_year, evt_share_value, evt_entry_quarter, evt_erosion_rate,
-            evt_launch_date, evt_steady_state, evt_sob_value,
-            event_data_full_text
-        ) VALUES %s
-        ON CONFLICT (source_id) DO UPDATE SET
-            version_ended_at    = EXCLUDED.version_ended_at,
-            is_current_version  = EXCLUDED.is_current_version,
-            is_validated        = EXCLUDED.is_validated,
-            validation_message  = EXCLUDED.validation_message,
+    cols = ", ".join(EVENT_DATA_COLUMNS)
+    update_sql = """
+        UPDATE fact_event_input_history t SET
+            version_ended_at    = s.version_ended_at,
+            is_current_version  = s.is_current_version,
+            is_validated        = s.is_validated,
+            validation_message  = s.validation_message,
             etl_loaded_at       = NOW()
+        FROM {staging} s
+        WHERE t.source_id = s.source_id
+          AND (t.version_ended_at, t.is_current_version,
+               t.is_validated,     t.validation_message)
+              IS DISTINCT FROM
+              (s.version_ended_at, s.is_current_version,
+               s.is_validated,     s.validation_message)
     """
-    n = executemany_target(sql, rows)
-    logger.info(f"  fact_event_input_history: {n} rows upserted")
+    insert_sql = f"""
+        INSERT INTO fact_event_input_history ({cols})
+        SELECT {cols} FROM {{staging}}
+        ON CONFLICT (source_id) DO NOTHING
+    """
+    n = copy_target("fact_event_input_history", EVENT_DATA_COLUMNS, rows,
+                    [update_sql, insert_sql])
+    if n:
+        logger.info(f"  fact_event_input_history: {n} rows upserted")
     return n
 
 
+TIMELINE_COLUMNS = [
+    "scenario_id", "event_time", "event_type", "event_category",
+    "actor", "description", "run_id", "node_name", "event_type_name",
+    "source_key",
+]
+
+
 def load_timeline(rows):
     """
     INSERT ONLY with dedup via source_key.
     Why: Timeline is an event log — events never change, only new ones arrive.
     source_key (e.g. 'NE_<uuid>') ensures the same event isn't inserted twice
-    even if the ETL re-processes due to overlap.
+    even if the ETL re-processes due to overlap. The key is unique together
+    with event_time (the table is partitioned on it); keys whose time can
+    change carry it, so a resubmitted scenario gets a new SUBMITTED event.
+    Why keep the UNIQUE key: it is what makes the dedup safe, and the cost is
+    one index probe per row either way (an anti-join needs the same index).
+    What's paid per batch instead of per row is the ingest — COPY into
+    staging, then one INSERT ... ON CONFLICT DO NOTHING, like the other
+    append-only loaders.
     """
     if not rows:
         return 0
-    sql = """
-        INSERT INTO fact_scenario_timeline (
-            scenario_id, event_time, event_type, event_category,
-            actor, description, run_id, node_name, event_type_name, source_key
-        ) VALUES %s
-        ON CONFLICT (source_key) DO NOTHING
-    """
-    n = executemany_target(sql, rows)
-    logger.info(f"  fact_scenario_timeline: {n} events inserted")
+    cols = ", ".join(TIMELINE_COLUMNS)
+    merge_sql = f"""
+        INSERT INTO fact_scenario_timeline ({cols})
+        SELECT {cols} FROM {{staging}}
+        ON CONFLICT (source_key, event_time) DO NOTHING
+    """
+    n = copy_target("fact_scenario_timeline", TIMELINE_COLUMNS, rows, [merge_sql])
+    if n:
+        logger.info(f"  fact_scenario_timeline: {n} events inserted")
     return n
@@ -2,17 +2,24 @@
 # This runs every 30 seconds from scheduler.py
 
 import logging
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
 from datetime import datetime
 
+from config import ETL_WORKERS, MAX_BATCH_ROWS
+
 from extract import (
-    get_watermark, update_watermark,
+    FIRST_PAGE, get_all_watermarks, save_progress, update_watermarks,
     extract_scenarios, extract_node_data, extract_runs,
-    extract_node_calc, extract_event_data, extract_timeline_events
+    extract_node_calc, extract_event_data
 )
 from transform import (
     transform_scenarios, transform_node_data, transform_runs,
-    transform_node_calc, transform_event_data, transform_timeline
+    transform_node_calc, transform_event_data,
+    timeline_from_scenarios, timeline_from_node_data,
+    timeline_from_runs, timeline_from_event_data
 )
 from load import (
     load_scenarios, load_node_data, load_runs,
@@ -22,94 +29,127 @@ from load import (
 logger = logging.getLogger(__name__)
 
 
-def run_cycle():
+# One entry per source table:
+#   (watermark key, label, extract, transform, load, timeline builder or None)
+# The steps touch independent source/target tables, so they run concurrently.
+# Timeline events are derived from each step's own extracted rows and loaded
+# right after that step's table, so the watermark only advances once both land.
+STEPS = [
+    ("public.fc_scenario",            "Scenarios",  extract_scenarios,  transform_scenarios,  load_scenarios,  timeline_from_scenarios),
+    ("public.fc_scenario_node_data",  "Node data",  extract_node_data,  transform_node_data,  load_node_data,  timeline_from_node_data),
+    ("public.fc_scenario_run",        "Runs",       extract_runs,       transform_runs,       load_runs,       timeline_from_runs),
+    ("public.fc_scenario_node_calc",  "Node calc",  extract_node_calc,  transform_node_calc,  load_node_calc,  None),
+    ("public.fc_scenario_event_data", "Event data", extract_event_data, transform_event_data, load_event_data, timeline_from_event_data),
+]
+
+
+def _produce(batches, queue, stop):
     """
-    One full ETL cycle:
-    1. Read watermark (what time did we last process?)
-    2. Extract only NEW/CHANGED rows from source since that time
-    3. Transform (flatten JSONB, resolve append-only logic)
-    4. Load into target DB (upsert / insert with dedup)
-    5. Update watermark to now
-    Returns total rows processed.
+    Producer half of a step: push each extracted batch onto `queue`, then
+    None as the end-of-stream sentinel (always — even if the extract fails).
     """
-    cycle_start = time.time()
-    total_rows  = 0
-    logger.info("─" * 60)
-    logger.info(f"ETL cycle starting at {datetime.utcnow().isoformat()}")
-
-    # ── Step 1: Scenarios ──────────────────────────────────────────
     try:
-        since = get_watermark("public.fc_scenario")
-        rows  = extract_scenarios(since)
-        if rows:
-            transformed = transform_scenarios(rows)
-            n = load_scenarios(transformed)
-            total_rows += n
-        update_watermark("public.fc_scenario", len(rows))
-    except Exception as e:
-        logger.error(f"  ❌ Scenarios ETL failed: {e}", exc_info=True)
+        for batch in batches:
+            if stop.is_set():
+                break
+            queue.put(batch)
+    finally:
+        queue.put(None)
 
-    # ── Step 2: Node input data (append-only — JSONB flattening) ──
-    try:
-        since = get_watermark("public.fc_scenario_node_data")
-        rows  = extract_node_data(since)
-        if rows:
-            transformed = transform_node_data(rows)
-            n = load_node_data(transformed)
-            total_rows += n
-        update_watermark("public.fc_scenario_node_data", len(rows))
-    except Exception as e:
-        logger.error(f"  ❌ Node data ETL failed: {e}", exc_info=True)
 
-    # ── Step 3: Runs ───────────────────────────────────────────────
+def run_step(watermark, table, label, extract_fn, transform_fn, load_fn, timeline_fn):
+    """
+    Extract → transform → load a single source table, plus the timeline
+    events derived from the same rows.
+    Extract runs on its own producer thread and hands row batches over a
+    bounded queue; this thread transforms and loads them as they arrive, so
+    source reads and target writes overlap. maxsize=2 caps memory at a couple
+    of batches in flight.
+    Once a step has loaded a full page, the cursor after each later batch is
+    saved (save_progress), so a catch-up that fails part-way resumes there
+    next cycle; smaller cycles just start over.
+    Failures are logged and swallowed so one table never blocks the others.
+    Returns (rows written, rows extracted), or None if the step failed.
+    """
+    since, after, read_at = watermark
     try:
-        since = get_watermark("public.fc_scenario_run")
-        rows  = extract_runs(since)
-        if rows:
-            transformed = transform_runs(rows)
-            n = load_runs(transformed)
-            total_rows += n
-        update_watermark("public.fc_scenario_run", len(rows))
+        batches = Queue(maxsize=2)
+        stop = threading.Event()
+        with ThreadPoolExecutor(max_workers=1) as producer_pool:
+            producer = producer_pool.submit(_produce, extract_fn(since, after), batches, stop)
+            n = fetched = 0
+            try:
+                while (item := batches.get()) is not None:
+                    rows, after = item
+                    fetched += len(rows)
+                    transformed = transform_fn(rows)
+                    n += load_fn(transformed)
+                    if timeline_fn:
+                        n += load_timeline(timeline_fn(rows))
+                    if fetched >= MAX_BATCH_ROWS:
+                        save_progress(table, after, read_at)
+            except Exception:
+                # Unblock the producer and let it wind down before re-raising
+                stop.set()
+                while batches.get() is not None:
+                    pass
+                raise
+            producer.result()                   # re-raises an extract failure
+        return n, fetched
     except Exception as e:
-        logger.error(f"  ❌ Runs ETL failed: {e}", exc_info=True)
+        logger.error(f"  ❌ {label} ETL failed: {e}", exc_info=True)
+        return None
 
-    # ── Step 4: Node calculation results (outputs) ─────────────────
-    try:
-        since = get_watermark("public.fc_scenario_node_calc")
-        rows  = extract_node_calc(since)
-        if rows:
-            transformed = transform_node_calc(rows)
-            n = load_node_calc(transformed)
-            total_rows += n
-        update_watermark("public.fc_scenario_node_calc", len(rows))
-    except Exception as e:
-        logger.error(f"  ❌ Node calc ETL failed: {e}", exc_info=True)
 
-    # ── Step 5: Event data (append-only — JSONB flattening) ────────
-    try:
-        since = get_watermark("public.fc_scenario_event_data")
-        rows  = extract_event_data(since)
-        if rows:
-            transformed = transform_event_data(rows)
-            n = load_event_data(transformed)
-            total_rows += n
-        update_watermark("public.fc_scenario_event_data", len(rows))
-    except Exception as e:
-        logger.error(f"  ❌ Event data ETL failed: {e}", exc_info=True)
+def run_cycle(tables=None):
+    """
+    One full ETL cycle (or, if `tables` is given, just the steps for those
+    watermark keys — used when a source NOTIFY says which tables changed):
+    1. Read all watermarks in one query (what time did we last process?),
+       noting the current time as the next watermark
+    Then for every table in STEPS, concurrently:
+    2. Extract only NEW/CHANGED rows from source since that time
+       (resuming a catch-up the last cycle left part-way)
+    3. Transform (flatten JSONB, resolve append-only logic)
+    4. Load into target DB (upsert / insert with dedup)
+    Then, once every step is done:
+    5. Move the watermark to the time noted in step 1 for each table that
+       succeeded with rows or finished a resumed catch-up (one statement)
+    Each step holds its own pooled connection, so the source round-trips
+    overlap and a table's load starts as soon as its first batch arrives.
+    psycopg2 releases the GIL while waiting on the socket, so with
+    ETL_WORKERS >= len(STEPS) cycle time is roughly the slowest step
+    instead of the sum of all of them.
+    A failed step doesn't stop the others, but if every step fails (e.g.
+    source DB down) the cycle raises so scheduler.py counts the failure.
+    Returns total rows processed.
+    """
+    cycle_start = time.time()
+    logger.debug(f"ETL cycle starting at {datetime.utcnow().isoformat()}")
 
-    # ── Step 6: Timeline (UNION ALL — pre-built event log) ─────────
-    try:
-        since = get_watermark("timeline")
-        rows  = extract_timeline_events(since)
-        if rows:
-            transformed = transform_timeline(rows)
-            n = load_timeline(transformed)
-            total_rows += n
-        update_watermark("timeline", len(rows))
-    except Exception as e:
-        logger.error(f"  ❌ Timeline ETL failed: {e}", exc_info=True)
+    steps = [step for step in STEPS if tables is None or step[0] in tables]
+    watermarks = get_all_watermarks([step[0] for step in steps])
+
+    with ThreadPoolExecutor(max_workers=ETL_WORKERS) as executor:
+        futures = [executor.submit(run_step, watermarks[step[0]], *step) for step in steps]
+        results = [f.result() for f in futures]
 
+    failed = [step[1] for step, res in zip(steps, results) if res is None]
+    done = {step[0]: res for step, res in zip(steps, results) if res is not None}
+    total_rows = sum(written for written, _ in done.values())
+    # Only steps that succeeded AND found rows (or resumed) move their
+    # watermark — an idle table keeps its old one, so an idle cycle writes
+    # nothing here
+    update_watermarks({
+        t: (fetched, watermarks[t][2]) for t, (_, fetched) in done.items()
+        if fetched or watermarks[t][1] != FIRST_PAGE
+    })
     elapsed = round(time.time() - cycle_start, 2)
-    logger.info(f"ETL cycle complete — {total_rows} rows written in {elapsed}s")
-    logger.info("─" * 60)
+    # One summary line per cycle — an idle cycle only shows up at DEBUG
+    summary = f"ETL cycle complete — {total_rows} rows written in {elapsed}s"
+    logger.log(logging.INFO if total_rows or failed else logging.DEBUG, summary)
+    if failed:
+        logger.warning(f"⚠️ {len(failed)}/{len(steps)} steps failed: {', '.join(failed)}")
+    if steps and len(failed) == len(steps):
+        raise RuntimeError(f"every ETL step failed ({', '.join(failed)})")
     return total_rows
@@ -2,34 +2,95 @@
 # scheduler.py — entry point. Run this on your VM. It loops forever.
 #
 # WHAT IT DOES:
-#   Every 30 seconds:
+#   Shortly after a source table changes (LISTEN/NOTIFY), or every 30 seconds:
 #     1. Reads watermark from target DB ("what time did we last process?")
 #     2. Fetches only NEW rows from source PostgreSQL since that time
 #     3. Flattens JSONB, resolves append-only logic
 #     4. Upserts/inserts into target DB
 #     5. Updates watermark
-#     6. Sleeps 30 seconds → repeats
+#     6. Waits for the next NOTIFY (max 30 seconds), then a few seconds more
+#        to batch the burst it belongs to → repeats
+#   A NOTIFY runs only the tables it names; the 30s timeout runs all of them,
+#   so without the source triggers (setup_source_triggers.py) it just polls.
+#   At start and once a day it also creates the coming months' partitions.
 #
 # If source DB is unreachable: logs error, sleeps, retries — never crashes.
 # If one table ETL fails: other tables still process — isolated failures.
 
+import atexit
 import logging
+import logging.handlers
+import queue
+import select
 import time
 import sys
 from datetime import datetime
 
+# Pipeline threads only enqueue log records; a QueueListener thread does the
+# actual stdout / file writes, so disk I/O never stalls an ETL step.
+_log_format = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
+_log_handlers = [
+    logging.StreamHandler(sys.stdout),
+    # persistent log on VM — rotated at 10 MB, 5 old files kept
+    logging.handlers.RotatingFileHandler("etl.log", maxBytes=10 * 1024 * 1024, backupCount=5),
+]
+for _handler in _log_handlers:
+    _handler.setFormatter(_log_format)
+_log_queue = queue.Queue()
+_log_listener = logging.handlers.QueueListener(_log_queue, *_log_handlers)
+_log_listener.start()
+atexit.register(_log_listener.stop)     # flush queued records on exit
+
 logging.basicConfig(
     level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler("etl.log", mode="a")  # persistent log on VM
-    ]
+    format="%(message)s",               # timestamp/level added by _log_format
+    handlers=[logging.handlers.QueueHandler(_log_queue)]
 )
 logger = logging.getLogger(__name__)
 
-from config import POLL_INTERVAL_SEC
+from config import POLL_INTERVAL_SEC, NOTIFY_CHANNEL, NOTIFY_DEBOUNCE_SEC
+from db import source_listener
 from pipeline import run_cycle
+from setup_target import maintain_partitions
+
+# How often the monthly partitions are topped up (setup_target.create_partitions)
+PARTITION_CHECK_SEC = 24 * 60 * 60
+
+
+def open_listener():
+    """LISTEN for source change notifications; None (= plain polling) if unavailable."""
+    try:
+        return source_listener(NOTIFY_CHANNEL)
+    except Exception as e:
+        logger.warning(f"LISTEN unavailable, polling every {POLL_INTERVAL_SEC}s: {e}")
+        return None
+
+
+def wait_for_changes(listener, timeout):
+    """
+    Block until a source trigger NOTIFYs or `timeout` seconds pass.
+    The first NOTIFY starts a NOTIFY_DEBOUNCE_SEC window that gathers the
+    rest of the burst, so a stream of writes (one NOTIFY per statement)
+    becomes one cycle every few seconds instead of one per notification.
+    Returns the set of changed tables, or None on timeout (= run every table).
+    """
+    if listener is None:
+        time.sleep(timeout)
+        return None
+    tables = set()
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return tables or None
+        if select.select([listener], [], [], remaining) == ([], [], []):
+            return tables or None
+        listener.poll()
+        if listener.notifies:
+            if not tables:
+                deadline = min(deadline, time.monotonic() + NOTIFY_DEBOUNCE_SEC)
+            tables.update(n.payload for n in listener.notifies)
+            listener.notifies.clear()
 
 
 def main():
@@ -41,10 +102,29 @@ def main():
 
     consecutive_failures = 0
     MAX_CONSECUTIVE_FAILURES = 10   # Alert after 10 straight failures
+    listener = None
+    tables = None                   # None = every table; first cycle always runs all
+    last_full_cycle = 0.0
+    last_partition_check = None
 
     while True:
+        if listener is None:
+            listener = open_listener()
+        if last_partition_check is None or time.monotonic() - last_partition_check >= PARTITION_CHECK_SEC:
+            last_partition_check = time.monotonic()
+            try:
+                maintain_partitions()
+            except Exception as e:
+                # Rows still land in the _default partition; retried tomorrow
+                logger.error(f"❌ Partition maintenance failed: {e}", exc_info=True)
+        # Steady NOTIFY traffic must not starve the full-cycle safety net
+        if time.monotonic() - last_full_cycle >= POLL_INTERVAL_SEC:
+            tables = None
+        if tables is None:
+            last_full_cycle = time.monotonic()
+
         try:
-            run_cycle()
+            run_cycle(tables)
             consecutive_failures = 0   # Reset on success
 
         except KeyboardInterrupt:
@@ -64,9 +144,16 @@ def main():
                 )
                 # Could send an alert here (email, Slack webhook, etc.)
 
-        # Always sleep before next cycle, even after failure
-        logger.debug(f"Sleeping {POLL_INTERVAL_SEC}s before next cycle...")
-        time.sleep(POLL_INTERVAL_SEC)
+        # Always wait before next cycle, even after failure
+        logger.debug(f"Waiting up to {POLL_INTERVAL_SEC}s for source changes...")
+        try:
+            tables = wait_for_changes(listener, POLL_INTERVAL_SEC)
+        except Exception as e:
+            # Listener connection dropped — reopen next loop, run a full cycle
+            logger.warning(f"Source listener lost: {e}")
+            listener.close()
+            listener = None
+            tables = None
 
 
 if __name__ == "__main__":
@@ -0,0 +1,68 @@
+# setup_source_triggers.py
+# OPTIONAL — run ONCE against the SOURCE DB, as a user that owns the tables.
+# The ETL's own source user stays read-only and never runs this.
+#
+# Adds statement-level triggers that NOTIFY '<schema>.<table>' on the
+# NOTIFY_CHANNEL whenever a watched table is written. scheduler.py LISTENs
+# and wakes straight away for just that table instead of waiting out the
+# poll interval. Without these triggers the ETL simply keeps polling.
+#
+# Owner credentials: SOURCE_ADMIN_USER / SOURCE_ADMIN_PASS (fall back to SOURCE).
+
+import os
+import psycopg2
+from config import SOURCE, NOTIFY_CHANNEL
+import logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Same keys as the etl_watermark rows, so the payload names the step to run
+WATCHED_TABLES = [
+    "public.fc_scenario",
+    "public.fc_scenario_node_data",
+    "public.fc_scenario_run",
+    "public.fc_scenario_node_calc",
+    "public.fc_scenario_event_data",
+]
+
+FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION public.etl_notify_change() RETURNS trigger AS $$
+BEGIN
+    -- NOTIFY collapses identical payloads within a transaction,
+    -- so a bulk write still wakes the ETL only once
+    PERFORM pg_notify('{NOTIFY_CHANNEL}', TG_TABLE_SCHEMA || '.' || TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+TRIGGER_SQL = """
+DROP TRIGGER IF EXISTS etl_notify_change ON {table};
+CREATE TRIGGER etl_notify_change
+    AFTER INSERT OR UPDATE ON {table}
+    FOR EACH STATEMENT EXECUTE FUNCTION public.etl_notify_change();
+"""
+
+def setup():
+    params = dict(SOURCE)
+    params["user"] = os.getenv("SOURCE_ADMIN_USER", SOURCE["user"])
+    params["password"] = os.getenv("SOURCE_ADMIN_PASS", SOURCE["password"])
+    conn = psycopg2.connect(**params)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(FUNCTION_SQL)
+            for table in WATCHED_TABLES:
+                cur.execute(TRIGGER_SQL.format(table=table))
+        conn.commit()
+        logger.info(f"✅ Change triggers installed (channel '{NOTIFY_CHANNEL}')")
+        for table in WATCHED_TABLES:
+            logger.info(f"   → {table}")
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"❌ Trigger setup failed: {e}")
+        raise
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    setup()
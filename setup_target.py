@@ -2,8 +2,11 @@
 # Run ONCE to create all tables in your target (writable) DB.
 # After this, the ETL fills them continuously.
 
+from datetime import date
+
 import psycopg2
-from config import TARGET
+import psycopg2.errors
+from config import TARGET, PARTITION_MONTHS_AHEAD
 import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -17,19 +20,29 @@ CREATE TABLE IF NOT EXISTS etl_watermark (
     last_fetched_at TIMESTAMP    NOT NULL DEFAULT '2020-01-01 00:00:00',
     rows_last_run   INT          DEFAULT 0,
     last_run_at     TIMESTAMP,
-    total_rows_ever BIGINT       DEFAULT 0
+    total_rows_ever BIGINT       DEFAULT 0,
+    -- Keyset cursor (paging timestamp as text, source id) and cycle start of
+    -- a catch-up that stopped part-way; NULL once the table is caught up
+    resume_after_at TEXT,
+    resume_after_id UUID,
+    resume_read_at  TIMESTAMP
 );
+-- Resume columns for tables created before they existed
+ALTER TABLE etl_watermark
+    ADD COLUMN IF NOT EXISTS resume_after_at TEXT,
+    ADD COLUMN IF NOT EXISTS resume_after_id UUID,
+    ADD COLUMN IF NOT EXISTS resume_read_at  TIMESTAMP;
 
--- Seed with all source tables (safe to re-run — ON CONFLICT DO NOTHING)
+-- Seed with every table pipeline.STEPS tracks (safe to re-run — ON CONFLICT DO NOTHING)
 INSERT INTO etl_watermark (table_name) VALUES
     ('public.fc_scenario'),
     ('public.fc_scenario_node_data'),
     ('public.fc_scenario_run'),
     ('public.fc_scenario_node_calc'),
-    ('public.fc_scenario_event_data'),
-    ('public.fc_scenario_run_branch'),
-    ('timeline')
+    ('public.fc_scenario_event_data')
 ON CONFLICT (table_name) DO NOTHING;
+-- Rows older setups seeded that no step reads or writes
+DELETE FROM etl_watermark WHERE table_name IN ('public.fc_scenario_run_branch', 'timeline');
 
 
 -- ── dim_scenario: one row per scenario, full lifecycle state ─────────────
@@ -83,8 +96,15 @@ CREATE TABLE IF NOT EXISTS dim_scenario (
 -- ── fact_scenario_timeline: every user action, chronologically ──────────
 -- INSERT ONLY — new events always appended, never overwritten.
 -- This is the table that powers the Journey Timeline visual in Power BI.
+-- Range-partitioned by month on event_time (partitions created below), so
+-- each partition's indexes stay small as the log grows and date-filtered
+-- Power BI queries only touch the months they need.
+-- Keys must include the partition column, hence (id, event_time) and
+-- (source_key, event_time) — dedup is per partition, so every key's event
+-- time is fixed: SUBM_/LOCK_/WITH_ keys carry their time (transform.py), and
+-- a withdraw + resubmit is recorded as new events rather than dropped.
 CREATE TABLE IF NOT EXISTS fact_scenario_timeline (
-    id                BIGSERIAL    PRIMARY KEY,
+    id                BIGSERIAL,
     scenario_id       UUID         NOT NULL,
     event_time        TIMESTAMP    NOT NULL,
     event_type        VARCHAR(50)  NOT NULL,
@@ -98,21 +118,28 @@ CREATE TABLE IF NOT EXISTS fact_scenario_timeline (
     node_name         VARCHAR(255),
     event_type_name   VARCHAR(100),
     -- Dedup key: prevents same event being inserted twice if ETL overlaps
-    source_key        VARCHAR(255) UNIQUE,
-    etl_loaded_at     TIMESTAMP    DEFAULT NOW()
-);
+    source_key        VARCHAR(255),
+    etl_loaded_at     TIMESTAMP    DEFAULT NOW(),
+    PRIMARY KEY (id, event_time),
+    UNIQUE (source_key, event_time)
+) PARTITION BY RANGE (event_time);
 CREATE INDEX IF NOT EXISTS idx_timeline_scenario_time
     ON fact_scenario_timeline(scenario_id, event_time);
 CREATE INDEX IF NOT EXISTS idx_timeline_event_type
     ON fact_scenario_timeline(event_type, event_category);
+-- Global dedup table from an earlier setup; superseded by the time-carrying keys
+DROP TABLE IF EXISTS timeline_source_keys;
 
 
 -- ── fact_node_input_history: every version of every node input ──────────
 -- INSERT ONLY for new versions. UPDATE when end_at gets set (version ended).
 -- is_current_version=TRUE means this is the live value right now.
+-- Range-partitioned by month on version_started_at, like the timeline; a
+-- version's start time never changes, so (source_id, version_started_at)
+-- is as unique as source_id alone.
 CREATE TABLE IF NOT EXISTS fact_node_input_history (
-    id                   BIGSERIAL    PRIMARY KEY,
-    source_id            UUID         UNIQUE,  -- public.fc_scenario_node_data.id
+    id                   BIGSERIAL,
+    source_id            UUID,                 -- public.fc_scenario_node_data.id
     scenario_id          UUID         NOT NULL,
     model_node_id        UUID         NOT NULL,
     -- Node context (pre-joined from public.fc_model_node + groups + tabs)
@@ -125,7 +152,7 @@ CREATE TABLE IF NOT EXISTS fact_node_input_history (
     node_seq             INT,
     flow                 VARCHAR(100),
     -- Version tracking
-    version_started_at   TIMESTAMP,
+    version_started_at   TIMESTAMP    NOT NULL,
     version_ended_at     TIMESTAMP,
     is_current_version   BOOLEAN      DEFAULT TRUE,
     edited_by            VARCHAR(255),
@@ -149,8 +176,10 @@ CREATE TABLE IF NOT EXISTS fact_node_input_history (
     inp_ppc_flag         BOOLEAN,
     -- Full JSON as text for Power BI tooltip / reference
     input_data_full_text TEXT,
-    etl_loaded_at        TIMESTAMP    DEFAULT NOW()
-);
+    etl_loaded_at        TIMESTAMP    DEFAULT NOW(),
+    PRIMARY KEY (id, version_started_at),
+    UNIQUE (source_id, version_started_at)
+) PARTITION BY RANGE (version_started_at);
 CREATE INDEX IF NOT EXISTS idx_node_hist_scenario
     ON fact_node_input_history(scenario_id, model_node_id, is_current_version);
 CREATE INDEX IF NOT EXISTS idx_node_hist_current
@@ -239,14 +268,109 @@ CREATE TABLE IF NOT EXISTS fact_event_input_history (
 CREATE INDEX IF NOT EXISTS idx_evt_scenario
     ON fact_event_input_history(scenario_id, is_current_version);
 
+
+-- ── Default partitions for the partitioned fact tables ──────────────────
+-- The monthly partitions are created by create_partitions() below — here at
+-- setup from 2020-01, then daily by scheduler.py a few months ahead of need.
+-- A row outside every monthly partition lands in _default, so an insert
+-- never fails for lack of a partition.
+CREATE TABLE IF NOT EXISTS fact_scenario_timeline_default
+    PARTITION OF fact_scenario_timeline DEFAULT;
+CREATE TABLE IF NOT EXISTS fact_node_input_history_default
+    PARTITION OF fact_node_input_history DEFAULT;
+
 """
 
+# Tables range-partitioned by month (see SCHEMA_SQL)
+PARTITIONED_TABLES = ("fact_scenario_timeline", "fact_node_input_history")
+
+
+def _next_month(m):
+    return date(m.year + m.month // 12, m.month % 12 + 1, 1)
+
+
+def create_partitions(conn, first_month, months_ahead=PARTITION_MONTHS_AHEAD):
+    """
+    Create the monthly partitions of every PARTITIONED_TABLES entry from
+    first_month through months_ahead months past the current one, skipping
+    those that exist. Commits; returns how many were created.
+    A month that already has rows in _default can't get its own partition
+    (Postgres refuses rather than move them) — it is logged and skipped,
+    and the rest still get created. Running ahead of need avoids that.
+    """
+    last = date.today().replace(day=1)
+    for _ in range(months_ahead):
+        last = _next_month(last)
+    created = 0
+    with conn.cursor() as cur:
+        for table in PARTITIONED_TABLES:
+            cur.execute(
+                "SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = %s::regclass",
+                [table]
+            )
+            existing = {r[0] for r in cur.fetchall()}
+            month = first_month
+            while month <= last:
+                following = _next_month(month)
+                name = f"{table}_{month:%Y_%m}"
+                if name not in existing:
+                    cur.execute("SAVEPOINT create_partition")
+                    try:
+                        cur.execute(
+                            f"CREATE TABLE {name} PARTITION OF {table} "
+                            f"FOR VALUES FROM (%s) TO (%s)",
+                            [month, following]
+                        )
+                        created += 1
+                    except psycopg2.errors.CheckViolation:
+                        cur.execute("ROLLBACK TO SAVEPOINT create_partition")
+                        logger.warning(
+                            f"⚠️ {table}_default already holds rows for {month:%Y-%m} — "
+                            f"{name} not created; those rows stay in the default partition"
+                        )
+                month = following
+    conn.commit()
+    if created:
+        logger.info(f"Created {created} monthly partitions")
+    return created
+
+
+def maintain_partitions():
+    """Top up the monthly partitions from the current month (scheduler.py, daily)."""
+    conn = psycopg2.connect(**TARGET)
+    try:
+        return create_partitions(conn, date.today().replace(day=1))
+    finally:
+        conn.close()
+
+
+def _check_partitioned(cur):
+    """
+    Fail if PARTITIONED_TABLES exist from an older, unpartitioned setup —
+    CREATE TABLE IF NOT EXISTS would keep them, and their UNIQUE keys don't
+    match the loaders' ON CONFLICT targets, so every load would fail.
+    """
+    cur.execute("""
+        SELECT t FROM UNNEST(%s::text[]) AS t
+        JOIN pg_class c ON c.oid = to_regclass(t)
+        WHERE c.relkind <> 'p'
+    """, [list(PARTITIONED_TABLES)])
+    old = [r[0] for r in cur.fetchall()]
+    if old:
+        raise RuntimeError(
+            f"Left over from an unpartitioned setup: {', '.join(old)} — recreate as "
+            f"described under 'Upgrading to partitioned tables' in README.md"
+        )
+
+
 def setup():
     conn = psycopg2.connect(**TARGET)
     try:
         with conn.cursor() as cur:
+            _check_partitioned(cur)
             cur.execute(SCHEMA_SQL)
         conn.commit()
+        create_partitions(conn, date(2020, 1, 1))
         logger.info("✅ Target schema created successfully")
         logger.info("   Tables created:")
         for t in ["etl_watermark","dim_scenario","fact_scenario_timeline",
@@ -0,0 +1,70 @@
+# tests/test_db.py — the prepared-extract tests need a reachable source DB
+# (SOURCE_* env vars, see config.py); the rest run without one
+# Run: SOURCE_HOST=... python -m pytest tests/
+
+import csv
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db  # noqa: E402
+
+needs_source = pytest.mark.skipif(
+    "SOURCE_HOST" not in os.environ, reason="SOURCE_HOST not set — no source DB to test against")
+
+
+def _run(name, value):
+    return [row for batch in db.iter_source_prepared(name, "SELECT $1::int + 1", [value])
+            for row in batch]
+
+
+def _prepare_time(conn, name):
+    with conn.cursor() as cur:
+        cur.execute("SELECT prepare_time FROM pg_prepared_statements WHERE name = %s", [name])
+        row = cur.fetchone()
+    return row and row[0]
+
+
+@needs_source
+def test_prepared_extract_runs_twice_on_one_connection():
+    # The pool hands back the connection it just got, so both calls share it —
+    # the second one must still find its prepared statement
+    with db.source_conn() as conn:
+        first = conn
+    assert _run("test_twice", 1) == [(2,)]
+    with db.source_conn() as conn:
+        prepared_at = _prepare_time(conn, "test_twice")
+    assert _run("test_twice", 2) == [(3,)]
+    with db.source_conn() as conn:
+        assert conn is first
+        assert "test_twice" in conn.prepared
+        # Still the server-side statement from the first call — not re-PREPAREd
+        assert prepared_at is not None
+        assert _prepare_time(conn, "test_twice") == prepared_at
+
+
+@needs_source
+def test_prepared_extract_recovers_when_statement_is_dropped():
+    assert _run("test_dropped", 1) == [(2,)]
+    with db.source_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DEALLOCATE ALL")
+    assert _run("test_dropped", 5) == [(6,)]
+
+
+@pytest.mark.parametrize("notnull", [True, False], ids=["QUOTE_NOTNULL", "fallback"])
+def test_copy_csv_keeps_null_apart_from_empty_and_backslash_n(notnull, monkeypatch):
+    # COPY ... (FORMAT csv) reads only an unquoted empty field as NULL
+    if not notnull:
+        monkeypatch.delattr(csv, "QUOTE_NOTNULL", raising=False)
+    elif not hasattr(csv, "QUOTE_NOTNULL"):
+        pytest.skip("csv.QUOTE_NOTNULL needs Python 3.12+")
+    rows = [(None, "", "\\N", 'say "hi"', 1), ("a,b", None, "line\nbreak", 2.5, True)]
+    assert db._copy_csv(rows).read() == (
+        ',"","\\N","say ""hi""","1"\n'
+        '"a,b",,"line\nbreak","2.5","True"\n'
+    )
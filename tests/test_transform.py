@@ -0,0 +1,173 @@
+# tests/test_transform.py — no database needed
+# The transforms read source rows by position (transform.py's ND_* / EVT_* /
+# RUN_* / SC_* / NC_* constants); these tests hold those positions to the
+# SELECT lists in extract.py and the column lists in load.py.
+# Run: python -m pytest tests/
+
+import os
+import re
+import sys
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("psycopg2")     # extract / load import db (no connection made)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import extract    # noqa: E402
+import load       # noqa: E402
+import transform  # noqa: E402
+
+
+def _select_names(sql):
+    """Output column names of the outermost SELECT list in `sql`."""
+    sql = re.sub(r"--[^\n]*", "", sql)
+    start = re.search(r"\bSELECT\b", sql).end()
+    items, depth, item_start = [], 0, start
+    for m in re.finditer(r"[(),]|\bFROM\b", sql[start:]):
+        token, pos = m.group(), start + m.start()
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth == 0:
+            items.append(sql[item_start:pos])
+            item_start = pos + 1
+            if token == "FROM":
+                break
+    # "expr AS name" → name; "alias.column" → column
+    return [item.split()[-1].split(".")[-1] for item in items]
+
+
+def _extracted_names(extract_fn, monkeypatch):
+    """Run extract_fn against a stub source and return its SELECT list."""
+    seen = []
+
+    def fake_prepared(name, sql, params):
+        seen.append(sql)
+        return iter(())
+
+    def fake_stream(sql, params):
+        seen.append(sql)
+        return iter(())
+
+    monkeypatch.setattr(extract, "iter_source_prepared", fake_prepared)
+    monkeypatch.setattr(extract, "iter_source", fake_stream)
+    list(extract_fn(datetime(2024, 1, 1)))
+    return _select_names(seen[0])
+
+
+@pytest.mark.parametrize("extract_fn, prefix", [
+    (extract.extract_scenarios, "SC_"),
+    (extract.extract_node_data, "ND_"),
+    (extract.extract_node_calc, "NC_"),
+    (extract.extract_event_data, "EVT_"),
+])
+def test_position_constants_name_their_select_column(extract_fn, prefix, monkeypatch):
+    # SC_CREATED_AT must point at created_at, ND_EDITED_BY at edited_by, ...
+    names = _extracted_names(extract_fn, monkeypatch)
+    constants = {k: v for k, v in vars(transform).items()
+                 if k.startswith(prefix) and isinstance(v, int)}
+    assert constants
+    for const, pos in constants.items():
+        assert names[pos] == const[len(prefix):].lower(), const
+
+
+def test_jsonb_key_slices_match_select_columns(monkeypatch):
+    names = _extracted_names(extract.extract_node_data, monkeypatch)
+    assert names[transform.ND_INPUT_KEYS] == [f"inp_{k}" for k in transform.INPUT_DATA_KEYS]
+    assert names[transform.ND_INPUT_DATA_FULL_TEXT] == "input_data_full_text"
+    assert len(names) == transform.ND_INPUT_DATA_FULL_TEXT + 1
+
+    names = _extracted_names(extract.extract_event_data, monkeypatch)
+    assert names[transform.EVT_EVENT_KEYS] == [f"evt_{k}" for k in transform.EVENT_DATA_KEYS]
+    assert names[transform.EVT_EVENT_DATA_FULL_TEXT] == "event_data_full_text"
+    assert len(names) == transform.EVT_EVENT_DATA_FULL_TEXT + 1
+
+
+# Target column → the SELECT column it is filled from, where the names differ
+@pytest.mark.parametrize("extract_fn, transform_fn, columns, renamed", [
+    (extract.extract_scenarios, transform.transform_scenarios, load.SCENARIO_COLUMNS,
+     {"scenario_id": "id", "scenario_status": "status"}),
+    (extract.extract_node_data, transform.transform_node_data, load.NODE_DATA_COLUMNS,
+     {"source_id": "id", "validation_message": "input_validation_message",
+      "data_source": "source"}),
+    (extract.extract_runs, transform.transform_runs, load.RUN_COLUMNS, {}),
+    (extract.extract_node_calc, transform.transform_node_calc, load.NODE_CALC_COLUMNS,
+     {"source_id": "id"}),
+    (extract.extract_event_data, transform.transform_event_data, load.EVENT_DATA_COLUMNS,
+     {"source_id": "id"}),
+])
+def test_transform_fills_every_load_column_from_its_source(
+        extract_fn, transform_fn, columns, renamed, monkeypatch):
+    # A row whose every value is its own column name shows where each lands
+    names = _extracted_names(extract_fn, monkeypatch)
+    out = list(transform_fn([tuple(names)]))
+    assert len(out[0]) == len(columns)
+    expected = [renamed.get(c, c) for c in columns]
+    if "is_current_version" in columns:
+        expected[columns.index("is_current_version")] = False   # version_ended_at is set
+    assert list(out[0]) == expected
+
+
+def _row(width, **values):
+    row = [None] * width
+    for const, value in values.items():
+        row[getattr(transform, const)] = value
+    return tuple(row)
+
+
+def test_timeline_from_scenarios_keys_and_skips_unset_times():
+    row = _row(len(load.SCENARIO_COLUMNS), SC_ID="s1",
+               SC_CREATED_AT="2024-01-01 09:00:00", SC_CREATED_BY="ann",
+               SC_SUBMITTED_AT="2024-02-01 10:00:00", SC_SUBMITTED_BY="bob")
+    events = transform.timeline_from_scenarios([row])
+    assert [(e[2], e[4], e[9]) for e in events] == [
+        ("SCENARIO_CREATED", "ann", "SC_s1"),
+        ("SUBMITTED", "bob", "SUBM_s1_2024-02-01 10:00:00"),
+    ]
+    assert all(len(e) == len(load.TIMELINE_COLUMNS) for e in events)
+
+
+def test_timeline_from_node_data_description_is_null_when_a_part_is():
+    width = transform.ND_INPUT_DATA_FULL_TEXT + 1
+    edited = _row(width, ND_ID="n1", ND_SCENARIO_ID="s1",
+                  ND_VERSION_STARTED_AT="2024-01-01 09:00:00",
+                  ND_NODE_DISPLAY_NAME="Price", ND_INPUT_VALIDATED=True)
+    unvalidated = _row(width, ND_ID="n2", ND_SCENARIO_ID="s1",
+                       ND_VERSION_STARTED_AT="2024-01-01 09:00:00",
+                       ND_NODE_DISPLAY_NAME="Price")
+    unstarted = _row(width, ND_ID="n3", ND_SCENARIO_ID="s1")
+    events = transform.timeline_from_node_data([edited, unvalidated, unstarted])
+    assert [(e[5], e[9]) for e in events] == [
+        ("Node edited: Price | Validated: true", "NE_n1"),
+        (None, "NE_n2"),
+    ]
+
+
+def test_timeline_from_event_data_adds_segment_when_present():
+    width = transform.EVT_EVENT_DATA_FULL_TEXT + 1
+    common = dict(EVT_SCENARIO_ID="s1", EVT_VERSION_STARTED_AT="2024-01-01 09:00:00",
+                  EVT_EVENT_TYPE_NAME="LOE")
+    events = transform.timeline_from_event_data([
+        _row(width, EVT_ID="e1", EVT_POPULATION_NODE_NAME="Adults", **common),
+        _row(width, EVT_ID="e2", **common),
+    ])
+    assert [(e[5], e[9]) for e in events] == [
+        ("Event edited: LOE | Segment: Adults", "EVT_e1"),
+        ("Event edited: LOE", "EVT_e2"),
+    ]
+
+
+def test_timeline_from_runs_emits_start_and_completion():
+    row = _row(len(load.RUN_COLUMNS), RUN_ID="r1", RUN_SCENARIO_ID="s1",
+               RUN_STATUS="FAILED", RUN_AT="2024-01-01 09:00:00", RUN_BY="ann",
+               RUN_COMPLETE_AT="2024-01-01 09:05:00", RUN_FAIL_REASON="timeout")
+    running = _row(len(load.RUN_COLUMNS), RUN_ID="r2", RUN_SCENARIO_ID="s1",
+                   RUN_AT="2024-01-01 10:00:00")
+    events = transform.timeline_from_runs([row, running])
+    assert [(e[2], e[5], e[6], e[9]) for e in events] == [
+        ("RUN_TRIGGERED", "Run started", "r1", "RT_r1"),
+        ("RUN_COMPLETED", "Run completed: FAILED | Error: timeout", "r1", "RC_r1"),
+        ("RUN_TRIGGERED", "Run started", "r2", "RT_r2"),
+    ]
@@ -1,304 +1,248 @@
 # transform.py — all data transformation logic
-# psycopg2 automatically deserializes PostgreSQL JSONB → Python dict
-# So input_data arrives as a real dict — no json.loads() needed
+# The extract SQL already pulls each INPUT/EVENT_DATA_KEYS entry out of the
+# JSONB and casts it to its target type, so those columns are copied through
+# here unchanged; only derived fields (is_current_version, timeline events) are built.
 
-import json
 import logging
+from operator import itemgetter
 from config import INPUT_DATA_KEYS, EVENT_DATA_KEYS
 
 logger = logging.getLogger(__name__)
 
-
-def safe_get(data, key):
-    """Safely extract a key from a dict (handles None and non-dict values)."""
-    if isinstance(data, dict):
-        return data.get(key)
-    return None
-
-
-def safe_bool(val):
-    """Convert various truthy representations to bool or None."""
-    if val is None:
-        return None
-    if isinstance(val, bool):
-        return val
-    if isinstance(val, str):
-        return val.lower() in ("true", "1", "yes")
-    return bool(val)
-
-
-def safe_numeric(val):
-    """Convert to float or None."""
-    if val is None:
-        return None
-    try:
-        return float(val)
-    except (ValueError, TypeError):
-        return None
-
-
-def safe_int(val):
-    """Convert to int or None."""
-    if val is None:
-        return None
-    try:
-        return int(val)
-    except (ValueError, TypeError):
-        return None
-
-
-def flatten_input_data(input_data):
-    """
-    Extracts known keys from input_data JSONB dict into typed values.
-    Returns a dict with one entry per INPUT_DATA_KEYS item.
-    Unknown keys are not lost — they stay in input_data_full_text.
-    """
-    if not isinstance(input_data, dict):
-        # Sometimes JSONB arrives as a string if not auto-deserialized
-        if isinstance(input_data, str):
-            try:
-                input_data = json.loads(input_data)
-            except Exception:
-                input_data = {}
-        else:
-            input_data = {}
-
-    return {
-        "inp_value":          safe_numeric(safe_get(input_data, "value")),
-        "inp_unit":           safe_get(input_data, "unit"),
-        "inp_start_year":     safe_int(safe_get(input_data, "start_year")),
-        "inp_end_year":       safe_int(safe_get(input_data, "end_year")),
-        "inp_input_type":     safe_get(input_data, "input_type"),
-        "inp_timeframe":      safe_get(input_data, "timeframe"),
-        "inp_dosing_type":    safe_get(input_data, "dosing_type"),
-        "inp_actuals_flag":   safe_bool(safe_get(input_data, "actuals_flag")),
-        "inp_curve_type":     safe_get(input_data, "curve_type"),
-        "inp_selected_output":safe_get(input_data, "selected_output"),
-        "inp_pfs_flag":       safe_bool(safe_get(input_data, "pfs_flag")),
-        "inp_ppc_flag":       safe_bool(safe_get(input_data, "ppc_flag")),
-        # Full JSON text for reference/tooltip in Power BI
-        "input_data_full_text": json.dumps(input_data, default=str) if input_data else None
-    }
-
-
-def flatten_event_data(event_data):
-    """Same pattern for event_data JSONB."""
-    if not isinstance(event_data, dict):
-        if isinstance(event_data, str):
-            try:
-                event_data = json.loads(event_data)
-            except Exception:
-                event_data = {}
-        else:
-            event_data = {}
-
-    return {
-        "evt_year":          safe_int(safe_get(event_data, "year")),
-        "evt_share_value":   safe_numeric(safe_get(event_data, "share_value")),
-        "evt_entry_quarter": safe_get(event_data, "entry_quarter"),
-        "evt_erosion_rate":  safe_numeric(safe_get(event_data, "erosion_rate")),
-        "evt_launch_date":   safe_get(event_data, "launch_date"),
-        "evt_steady_state":  safe_numeric(safe_get(event_data, "steady_state")),
-        "evt_sob_value":     safe_numeric(safe_get(event_data, "sob_value")),
-        "event_data_full_text": json.dumps(event_data, default=str) if event_data else None
-    }
+# ── Column positions in each extract's SELECT list (see extract.py) ────────
+# Source rows arrive as plain tuples — no per-row dict to build — so fields
+# are read by index. Keep these in step with the SELECT lists.
+
+# extract_scenarios — SELECT order already matches dim_scenario's columns
+SC_ID, SC_CREATED_AT, SC_CREATED_BY = 0, 10, 11
+SC_SUBMITTED_AT, SC_SUBMITTED_BY    = 12, 13
+SC_LOCKED_AT, SC_LOCKED_BY          = 14, 15
+SC_WITHDRAW_AT, SC_WITHDRAW_BY      = 18, 19
+
+# extract_node_data — one inp_* column per INPUT_DATA_KEYS entry, then full text
+(ND_ID, ND_SCENARIO_ID, ND_MODEL_NODE_ID, ND_INPUT_HASH,
+ ND_INPUT_VALIDATED, ND_INPUT_VALIDATION_MESSAGE, ND_SOURCE,
+ ND_VERSION_STARTED_AT, ND_VERSION_ENDED_AT, ND_EDITED_BY,
+ ND_NODE_DISPLAY_NAME, ND_NODE_TYPE, ND_NODE_SEQ, ND_FLOW,
+ ND_GROUP_NAME, ND_GROUP_TYPE, ND_GROUP_SEQ,
+ ND_TAB_NAME, ND_TAB_LEVEL, ND_TAB_SEQ) = range(20)
+ND_INPUT_KEYS = slice(20, 20 + len(INPUT_DATA_KEYS))
+ND_INPUT_DATA_FULL_TEXT = ND_INPUT_KEYS.stop
+
+# extract_runs — SELECT order already matches fact_run_summary's columns
+(RUN_ID, RUN_SCENARIO_ID, RUN_STATUS, RUN_AT, RUN_BY, RUN_COMPLETE_AT,
+ RUN_DURATION_MINUTES, RUN_FAIL_REASON) = range(8)
+RUN_COUNTS = slice(8, 13)   # branch_count … nodes_timeout
+
+# extract_event_data — one evt_* column per EVENT_DATA_KEYS entry, then full text
+(EVT_ID, EVT_SCENARIO_ID, EVT_EVENT_TYPE_NAME, EVT_IS_INHERENT,
+ EVT_POPULATION_NODE_NAME, EVT_PARENT_PRODUCT_NAME,
+ EVT_VERSION_STARTED_AT, EVT_VERSION_ENDED_AT, EVT_EDITED_BY,
+ EVT_EVENT_DATA_HASH, EVT_IS_OVERRIDDEN,
+ EVT_OVERRIDE_DATA_TEXT, EVT_IS_VALIDATED, EVT_VALIDATION_MESSAGE) = range(14)
+EVT_EVENT_KEYS = slice(14, 14 + len(EVENT_DATA_KEYS))
+EVT_EVENT_DATA_FULL_TEXT = EVT_EVENT_KEYS.stop
+
+# extract_node_calc — fact_node_calc_results' columns, then nc.created_at,
+# which the extract only selects to page on
+NC_CREATED_AT = 14
+
+# Output columns copied straight from the source row, split around the
+# computed is_current_version — each getter pulls its run in one C call
+_ND_HEAD = itemgetter(
+    ND_ID, ND_SCENARIO_ID, ND_MODEL_NODE_ID,
+    ND_NODE_DISPLAY_NAME, ND_NODE_TYPE, ND_TAB_NAME, ND_TAB_LEVEL,
+    ND_GROUP_NAME, ND_GROUP_TYPE, ND_NODE_SEQ, ND_FLOW,
+    ND_VERSION_STARTED_AT, ND_VERSION_ENDED_AT,
+)
+_ND_TAIL = itemgetter(
+    ND_EDITED_BY, ND_INPUT_HASH, ND_INPUT_VALIDATED,
+    ND_INPUT_VALIDATION_MESSAGE, ND_SOURCE,
+)
+
+_EVT_HEAD = itemgetter(
+    EVT_ID, EVT_SCENARIO_ID, EVT_EVENT_TYPE_NAME, EVT_IS_INHERENT,
+    EVT_POPULATION_NODE_NAME, EVT_PARENT_PRODUCT_NAME,
+    EVT_VERSION_STARTED_AT, EVT_VERSION_ENDED_AT,
+)
+_EVT_TAIL = itemgetter(
+    EVT_EDITED_BY, EVT_EVENT_DATA_HASH, EVT_IS_OVERRIDDEN,
+    EVT_OVERRIDE_DATA_TEXT, EVT_IS_VALIDATED, EVT_VALIDATION_MESSAGE,
+)
 
 
 def transform_scenarios(rows):
     """
-    Scenarios need minimal transformation — mostly just renaming columns
-    to match the target schema and handling None values.
+    Scenarios need no transformation — extract_scenarios already selects
+    the columns in dim_scenario order, renamed to match the target schema.
     Returns list of tuples for bulk upsert.
     """
-    result = []
-    for r in rows:
-        result.append((
-            r["id"],                        # scenario_id
-            r["scenario_display_name"],
-            r["status"],
-            r["is_starter"],
-            r["currency"],
-            r["currency_code"],
-            r["scenario_start_year"],
-            r["scenario_end_year"],
-            r.get("scenario_region_name"),
-            r.get("scenario_country_name"),
-            r["created_at"],
-            r["created_by"],
-            r.get("submitted_at"),
-            r.get("submitted_by"),
-            r.get("locked_at"),
-            r.get("locked_by"),
-            r.get("updated_at"),
-            r.get("updated_by"),
-            r.get("withdraw_at"),
-            r.get("withdraw_by"),
-            r.get("delete_at"),
-            r["model_id"],
-            r["model_display_name"],
-            r.get("model_type"),
-            r.get("model_publish_level"),
-            r["therapeutic_area_name"],
-            r["disease_area_name"],
-            r.get("loe_enabled"),
-            r.get("model_region_name"),
-            r.get("model_country_name"),
-            r.get("forecast_cycle_name"),
-            r.get("forecast_cycle_start"),
-            r.get("forecast_cycle_end"),
-            r.get("horizon_start_limit"),
-            r.get("horizon_end_limit"),
-            r.get("starter_created"),
-        ))
-    logger.debug(f"  Transformed {len(result)} scenarios")
-    return result
+    logger.debug(f"  Transformed {len(rows)} scenarios")
+    return rows
 
 
 def transform_node_data(rows):
     """
     The most important transformation:
-    1. Flatten input_data JSONB into typed columns
+    1. Place the input_data columns (flattened + typed by the extract SQL)
     2. Set is_current_version based on whether end_at is NULL
-    3. Return tuples ready for upsert
+    3. Yield tuples ready for upsert — a generator, so the COPY payload is
+       written straight from it with no intermediate list
     """
-    result = []
     for r in rows:
-        flat = flatten_input_data(r["input_data"])
-        is_current = r["version_ended_at"] is None
-
-        result.append((
-            r["id"],                        # source_id (for dedup)
-            r["scenario_id"],
-            r["model_node_id"],
-            r.get("node_display_name"),
-            r.get("node_type"),
-            r.get("tab_name"),
-            r.get("tab_level"),
-            r.get("group_name"),
-            r.get("group_type"),
-            r.get("node_seq"),
-            r.get("flow"),
-            r["version_started_at"],
-            r.get("version_ended_at"),
+        is_current = r[ND_VERSION_ENDED_AT] is None
+
+        yield (
+            *_ND_HEAD(r),                   # source_id … version_ended_at
             is_current,
-            r.get("edited_by"),
-            r.get("input_hash"),
-            r.get("input_validated"),
-            str(r["validation_message"]) if r.get("input_validation_message") else None,
-            r.get("source"),
-            # Flattened JSONB
-            flat["inp_value"],
-            flat["inp_unit"],
-            flat["inp_start_year"],
-            flat["inp_end_year"],
-            flat["inp_input_type"],
-            flat["inp_timeframe"],
-            flat["inp_dosing_type"],
-            flat["inp_actuals_flag"],
-            flat["inp_curve_type"],
-            flat["inp_selected_output"],
-            flat["inp_pfs_flag"],
-            flat["inp_ppc_flag"],
-            flat["input_data_full_text"],
-        ))
-    logger.debug(f"  Transformed {len(result)} node data rows")
-    return result
+            *_ND_TAIL(r),                   # edited_by … data_source
+            # Flattened JSONB, typed by the extract SQL — inp_value … inp_ppc_flag
+            *r[ND_INPUT_KEYS],
+            r[ND_INPUT_DATA_FULL_TEXT],
+        )
 
 
 def transform_runs(rows):
-    result = []
-    for r in rows:
-        result.append((
-            r["run_id"],
-            r["scenario_id"],
-            r.get("run_status"),
-            r.get("run_at"),
-            r.get("run_by"),
-            r.get("run_complete_at"),
-            r.get("run_duration_minutes"),
-            r.get("fail_reason"),
-            r.get("branch_count") or 0,
-            r.get("total_nodes_processed") or 0,
-            r.get("nodes_success") or 0,
-            r.get("nodes_failed") or 0,
-            r.get("nodes_timeout") or 0,
-        ))
-    logger.debug(f"  Transformed {len(result)} runs")
-    return result
+    # Same column order as the SELECT; NULL counts (run with no branches) → 0
+    return (r[:RUN_COUNTS.start] + tuple(v or 0 for v in r[RUN_COUNTS]) for r in rows)
 
 
 def transform_node_calc(rows):
-    result = []
-    for r in rows:
-        result.append((
-            r["id"],                        # source_id (dedup)
-            r["run_id"],
-            r["scenario_id"],
-            r.get("branch_id"),
-            r.get("event_tag"),
-            r.get("model_node_id"),
-            r.get("node_display_name"),
-            r.get("node_type"),
-            r.get("calc_status"),
-            r.get("fail_reason"),
-            r.get("processing_start_at"),
-            r.get("processing_end_at"),
-            r.get("processing_duration_s"),
-            r.get("output_data_text"),
-        ))
-    logger.debug(f"  Transformed {len(result)} node calc rows")
-    return result
+    # extract_node_calc already selects fact_node_calc_results' column order;
+    # only the trailing paging key is dropped
+    logger.debug(f"  Transformed {len(rows)} node calc rows")
+    return (r[:NC_CREATED_AT] for r in rows)
 
 
 def transform_event_data(rows):
-    result = []
+    # Generator, like transform_node_data
     for r in rows:
-        flat = flatten_event_data(r["event_data"])
-        is_current = r["version_ended_at"] is None
-
-        result.append((
-            r["id"],                        # source_id (dedup)
-            r["scenario_id"],
-            r.get("event_type_name"),
-            r.get("is_inherent"),
-            r.get("population_node_name"),
-            r.get("parent_product_name"),
-            r["version_started_at"],
-            r.get("version_ended_at"),
+        is_current = r[EVT_VERSION_ENDED_AT] is None
+
+        yield (
+            *_EVT_HEAD(r),                  # source_id … version_ended_at
             is_current,
-            r.get("edited_by"),
-            r.get("event_data_hash"),
-            r.get("is_overridden"),
-            r.get("override_data_text"),
-            r.get("is_validated"),
-            r.get("validation_message"),
-            flat["evt_year"],
-            flat["evt_share_value"],
-            flat["evt_entry_quarter"],
-            flat["evt_erosion_rate"],
-            flat["evt_launch_date"],
-            flat["evt_steady_state"],
-            flat["evt_sob_value"],
-            flat["event_data_full_text"],
-        ))
-    logger.debug(f"  Transformed {len(result)} event data rows")
-    return result
-
-
-def transform_timeline(rows):
-    result = []
+            *_EVT_TAIL(r),                  # edited_by … validation_message
+            *r[EVT_EVENT_KEYS],             # evt_year … evt_sob_value
+            r[EVT_EVENT_DATA_FULL_TEXT],
+        )
+
+
+# ── Timeline events ─────────────────────────────────────────────────────
+# Built from the rows the other extracts already fetched, instead of
+# re-scanning the same source tables with a separate UNION ALL query.
+# Each builder mirrors one or more of the old UNION branches and emits an
+# event whenever its timestamp is set. Rows can come back for an unrelated
+# change (e.g. a scenario update re-emits SCENARIO_CREATED) — source_key is
+# the prefix + source id (+ time, see _SCENARIO_EVENTS), so ON CONFLICT drops
+# those repeats.
+# Events are returned as tuples in fact_scenario_timeline column order.
+
+def _timeline_event(event_time, event_type, event_category, actor, description,
+                    scenario_id, source_key, run_id=None, node_name=None,
+                    event_type_name=None):
+    return (
+        scenario_id,
+        event_time,
+        event_type,
+        event_category,
+        actor,
+        description,
+        run_id,
+        node_name,
+        event_type_name,
+        source_key,         # UNIQUE key for dedup
+    )
+
+
+# Lifecycle events carried on each scenario row:
+#   (time column, actor column, event_type, description, source_key prefix,
+#    whether the key includes the event time)
+# SUBMITTED / LOCKED / WITHDRAWN times move when a scenario is withdrawn and
+# resubmitted, so their keys carry the time: each resubmit is recorded as a
+# new event, and the partition-local UNIQUE (source_key, event_time) still
+# drops every repeat of the same one.
+_SCENARIO_EVENTS = (
+    (SC_CREATED_AT,   SC_CREATED_BY,   "SCENARIO_CREATED", "Scenario created",   "SC_",   False),
+    (SC_SUBMITTED_AT, SC_SUBMITTED_BY, "SUBMITTED",        "Scenario submitted", "SUBM_", True),
+    (SC_LOCKED_AT,    SC_LOCKED_BY,    "LOCKED",           "Scenario locked",    "LOCK_", True),
+    (SC_WITHDRAW_AT,  SC_WITHDRAW_BY,  "WITHDRAWN",        "Scenario withdrawn", "WITH_", True),
+)
+
+
+def timeline_from_scenarios(rows):
+    """
+    SCENARIO_CREATED / SUBMITTED / LOCKED / WITHDRAWN events — one pass over
+    the scenario rows emits every lifecycle event each row carries.
+    """
+    events = []
+    for r in rows:
+        sid = r[SC_ID]
+        for time_col, actor_col, event_type, description, prefix, timed in _SCENARIO_EVENTS:
+            event_time = r[time_col]
+            if event_time:
+                key = f"{prefix}{sid}_{event_time}" if timed else f"{prefix}{sid}"
+                events.append(_timeline_event(
+                    event_time, event_type, "LIFECYCLE", r[actor_col],
+                    description, sid, key))
+    return events
+
+
+def timeline_from_node_data(rows):
+    """NODE_EDITED — every row in the append-only table is one edit event."""
+    events = []
+    for r in rows:
+        started = r[ND_VERSION_STARTED_AT]
+        if started is None:
+            continue
+        node_name = r[ND_NODE_DISPLAY_NAME]
+        validated = r[ND_INPUT_VALIDATED]
+        # SQL string concat with a NULL operand yields NULL — keep that behaviour
+        description = None
+        if node_name is not None and validated is not None:
+            description = f"Node edited: {node_name} | Validated: {str(validated).lower()}"
+        events.append(_timeline_event(
+            started, "NODE_EDITED", "INPUT_CHANGE", r[ND_EDITED_BY],
+            description, r[ND_SCENARIO_ID], f"NE_{r[ND_ID]}", node_name=node_name))
+    return events
+
+
+def timeline_from_event_data(rows):
+    """EVENT_EDITED — every row in the append-only table is one edit event."""
+    events = []
+    for r in rows:
+        started = r[EVT_VERSION_STARTED_AT]
+        if started is None:
+            continue
+        type_name = r[EVT_EVENT_TYPE_NAME]
+        description = None
+        if type_name is not None:
+            description = f"Event edited: {type_name}"
+            if r[EVT_POPULATION_NODE_NAME] is not None:
+                description += f" | Segment: {r[EVT_POPULATION_NODE_NAME]}"
+        events.append(_timeline_event(
+            started, "EVENT_EDITED", "EVENT_CHANGE", r[EVT_EDITED_BY],
+            description, r[EVT_SCENARIO_ID], f"EVT_{r[EVT_ID]}",
+            event_type_name=type_name))
+    return events
+
+
+def timeline_from_runs(rows):
+    """RUN_TRIGGERED / RUN_COMPLETED events."""
+    events = []
     for r in rows:
-        result.append((
-            r["scenario_id"],
-            r["event_time"],
-            r["event_type"],
-            r.get("event_category"),
-            r.get("actor"),
-            r.get("description"),
-            r.get("run_id"),
-            r.get("node_name"),
-            r.get("event_type_name"),
-            r.get("source_key"),        # UNIQUE key for dedup
-        ))
-    logger.debug(f"  Transformed {len(result)} timeline events")
-    return result
+        run_id = r[RUN_ID]
+        if r[RUN_AT]:
+            events.append(_timeline_event(
+                r[RUN_AT], "RUN_TRIGGERED", "RUN", r[RUN_BY],
+                "Run started", r[RUN_SCENARIO_ID], f"RT_{run_id}", run_id=run_id))
+        if r[RUN_COMPLETE_AT]:
+            description = None
+            if r[RUN_STATUS] is not None:
+                description = f"Run completed: {r[RUN_STATUS]}"
+                if r[RUN_FAIL_REASON] is not None:
+                    description += f" | Error: {r[RUN_FAIL_REASON]}"
+            events.append(_timeline_event(
+                r[RUN_COMPLETE_AT], "RUN_COMPLETED", "RUN", r[RUN_BY],
+                description, r[RUN_SCENARIO_ID], f"RC_{run_id}", run_id=run_id))
+    return events